@@ -25,6 +25,10 @@ import numpy as np
 import bisect
 import time
 import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from smti_instance import SMTIInstance, tuple_ranks
 
 
 def randomTieBreaker(preferenceList):
@@ -87,20 +91,6 @@ def DA(n, preferenceDict1, preferenceDict2):
     return matching_returned
 
 
-def find_index(a_list, s):
-    # if s is -1 return the length so that to find blocking pairs all the pref_list will be scanned in findblockingpairs function
-    if s == -1:
-        return len(a_list)
-    if s in a_list:
-        return a_list.index(s)
-    else:
-        for el in a_list:
-            if isinstance(el, tuple):
-                if s in el:
-                    return a_list.index(el)
-    return -1
-
-
 """
   step1 population initialized, /
   step2 cycle_crossover_operator /
@@ -138,14 +128,19 @@ def select(r, population, fitness_fn, mpref, wpref):
     return [sampler() for i in range(r)]
 
 
+# ranks come from the rank tables of the preference lists (see smti_instance.TupleDict):
+# ranks[agent].get(s, -1) is the index of s or of its tie in the list of agent, -1 if s
+# is not in it and the length of the list if s is -1, so that to find blocking pairs all
+# the pref_list will be scanned
 def numberBP(matching, men_pref, women_pref):
-    unzipped = list(zip(*matching))
-    matched_men = list(unzipped[0])
-    matched_women = list(unzipped[1])
+    men_ranks, women_ranks = tuple_ranks(men_pref), tuple_ranks(women_pref)
+    # partners of the men and women, the first pair of each counts as in list.index
+    partner_m = dict(reversed(matching))
+    partner_w = {woman: man for man, woman in reversed(matching)}
     num_BP = 0
     for man in men_pref.keys():
         # index of the current match
-        index = find_index(men_pref[man], matched_women[matched_men.index(man)])
+        index = men_ranks[man].get(partner_m[man], -1)
         # if woman is not in the list ??burayı tutmalı mıyım
         if index == -1:
             index = len(men_pref[man])
@@ -153,28 +148,29 @@ def numberBP(matching, men_pref, women_pref):
             woman = men_pref[man][ind]
             if isinstance(woman, tuple):  # if there is a tie
                 for wom in woman:
-                    my_rank = find_index(women_pref[wom], man)
-                    currentP_rank = find_index(women_pref[wom], matched_men[matched_women.index(wom)])
+                    my_rank = women_ranks[wom].get(man, -1)
+                    currentP_rank = women_ranks[wom].get(partner_w[wom], -1)
                     if currentP_rank > my_rank:
                         num_BP += 1
             else:
-                my_rank = find_index(women_pref[woman], man)
-                currentP_rank = find_index(women_pref[woman], matched_men[matched_women.index(woman)])
+                my_rank = women_ranks[woman].get(man, -1)
+                currentP_rank = women_ranks[woman].get(partner_w[woman], -1)
                 if currentP_rank > my_rank:
                     num_BP += 1
     return num_BP
 
 
 def isStable(matching, men_pref, women_pref):
-    unzipped = list(zip(*matching))
-    matched_men = list(unzipped[0])
-    matched_women = list(unzipped[1])
+    men_ranks, women_ranks = tuple_ranks(men_pref), tuple_ranks(women_pref)
+    # partners of the men and women, the first pair of each counts as in list.index
+    partner_m = dict(reversed(matching))
+    partner_w = {woman: man for man, woman in reversed(matching)}
     # print(matched_men,matched_women)
     num_BP = 0
     try:
         for man in men_pref.keys():
             # index of the current match
-            index = find_index(men_pref[man], matched_women[matched_men.index(man)])
+            index = men_ranks[man].get(partner_m[man], -1)
             # if woman is not in the list ??burayı tutmalı mıyım
             if index == -1:
                 index = len(men_pref[man])
@@ -182,13 +178,13 @@ def isStable(matching, men_pref, women_pref):
                 woman = men_pref[man][ind]
                 if isinstance(woman, tuple):  # if there is a tie
                     for wom in woman:
-                        my_rank = find_index(women_pref[wom], man)
-                        currentP_rank = find_index(women_pref[wom], matched_men[matched_women.index(wom)])
+                        my_rank = women_ranks[wom].get(man, -1)
+                        currentP_rank = women_ranks[wom].get(partner_w[wom], -1)
                         if currentP_rank > my_rank:
                             return False
                 else:
-                    my_rank = find_index(women_pref[woman], man)
-                    currentP_rank = find_index(women_pref[woman], matched_men[matched_women.index(woman)])
+                    my_rank = women_ranks[woman].get(man, -1)
+                    currentP_rank = women_ranks[woman].get(partner_w[woman], -1)
                     if currentP_rank > my_rank:
                         return False
         return True
@@ -262,6 +258,7 @@ def cycle_crossover_operator(x, y, pref1, pref2):
 
 
 def createGraph(match, mpref, wpref):
+    mranks, wranks = tuple_ranks(mpref), tuple_ranks(wpref)
     graph = {i: [] for i in range(len(match))}
     for m in range(len(match)):  # m is index of the match
         m1 = match[m][0]
@@ -271,18 +268,18 @@ def createGraph(match, mpref, wpref):
                 if match[n][0] == -1:
                     graph[m].append(n)
         else:
-            rank1w = find_index(wpref[w1], m1)
+            rank1w = wranks[w1].get(m1, -1)
             for n in range(len(match)):
                 if n != m:
                     m2 = match[n][0]
                     w2 = match[n][1]
                     if m2 != -1:
-                        rank2m = find_index(mpref[m2], w2)
-                        rank3w = find_index(wpref[w1], m2)
-                        rank3m = find_index(mpref[m2], w1)
+                        rank2m = mranks[m2].get(w2, -1)
+                        rank3w = wranks[w1].get(m2, -1)
+                        rank3m = mranks[m2].get(w1, -1)
                         if rank1w >= rank3w:
                             if rank2m >= rank3m:
-                                if find_index(wpref[w1], m2) != -1:
+                                if rank3w != -1:
                                     graph[m].append(n)
     return graph
 
@@ -402,43 +399,9 @@ def main():
     else:
         inputF = sys.argv[1]
 
-    with open(inputF) as fp:
-        lines = fp.readlines()
-    mensize = int(lines[1])
-    womensize = int(lines[2])
-    menprefDict = {key: [] for key in range(1, int(mensize) + 1)}
-    womenprefDict = {key: [] for key in range(1, int(womensize) + 1)}
-    for line in lines[3:int(mensize) + 3]:
-        preferencesM = line.split()
-        tupl = []
-        for p in range(1, len(preferencesM)):
-            if '(' in preferencesM[p] and ')' in preferencesM[p]:
-                menprefDict[int(preferencesM[0])].append(int(preferencesM[p][1:-1]))
-            elif ')' in preferencesM[p]:
-                tupl.append(int(preferencesM[p][:-1]))
-                menprefDict[int(preferencesM[0])].append(tuple(tupl))
-                tupl = []
-            else:
-                if '(' in preferencesM[p]:
-                    tupl.append(int(preferencesM[p][1:]))
-                else:
-                    tupl.append(int(preferencesM[p]))
-
-    for line in lines[int(mensize) + 3:]:
-        preferencesW = line.split()
-        tupl = []
-        for p in range(1, len(preferencesW)):
-            if '(' in preferencesW[p] and ')' in preferencesW[p]:
-                womenprefDict[int(preferencesW[0])].append(int(preferencesW[p][1:-1]))
-            elif ')' in preferencesW[p]:
-                tupl.append(int(preferencesW[p][:-1]))
-                womenprefDict[int(preferencesW[0])].append(tuple(tupl))
-                tupl = []
-            else:
-                if '(' in preferencesW[p]:
-                    tupl.append(int(preferencesW[p][1:]))
-                else:
-                    tupl.append(int(preferencesW[p]))
+    instance = SMTIInstance.from_file(inputF)
+    menprefDict = instance.men.tuple_dict()
+    womenprefDict = instance.women.tuple_dict()
 
     population_size = 50
     sTime = time.time()
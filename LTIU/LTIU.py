@@ -1,10 +1,18 @@
 import time
 import random
+import multiprocessing
+import json
+from bisect import bisect_left, insort
+from heapq import heapify, heappop, heappush
 import sys
+import os
 # Needed to hide warnings in the matplotlib sections
 import warnings
 import argparse
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from smti_instance import SMTIInstance, tuple_ranks
+
 # -*- coding: utf-8 -*-
 """LTIU-knuth.ipynb
 
@@ -39,27 +47,18 @@ def match(men_size, women_size):
     return list(zip(men, women))
 
 
-def find_index(a_list, s):
-    # if s is -1 return the length so that to find blocking pairs all the pref_list will be scanned in findblockingpairs function
-    if s == -1:
-        return len(a_list)
-    if s in a_list:
-        return a_list.index(s)
-    else:
-        for el in a_list:
-            if isinstance(el, tuple):
-                if s in el:
-                    return a_list.index(el)
-    return -1
-
-
+# ranks come from the rank tables of the preference lists (see smti_instance.TupleDict):
+# ranks[agent].get(s, -1) is the index of s or of its tie in the list of agent, -1 if s
+# is not in it and the length of the list if s is -1
 def findBlockingPairs(matching, men_pref, women_pref):
+    men_ranks, women_ranks = tuple_ranks(men_pref), tuple_ranks(women_pref)
     blocking_pairs = [(-1, -1)]
     match_dict = dict(matching)
+    woman_dict = {woman: man for man, woman in matching}  # partner of each matched woman
     reverse_bpairs = {}
     for man in men_pref.keys():
         if match_dict.get(man) != None:
-            index = find_index(men_pref[man], match_dict.get(man))
+            index = men_ranks[man].get(match_dict.get(man), -1)
             if index == -1:  # unacceptable pair, should break them
                 index = len(men_pref[man])
                 matching.remove((man, match_dict.get(man)))
@@ -70,10 +69,10 @@ def findBlockingPairs(matching, men_pref, women_pref):
             woman = men_pref[man][ind]
             if isinstance(woman, tuple):  # if there is a tie
                 for wom in woman:
-                    my_rank = find_index(women_pref[wom], man)
-                    if wom in list(match_dict.values()):  # if she is not single
-                        currentP = list(match_dict.keys())[list(match_dict.values()).index(wom)]
-                        currentP_rank = find_index(women_pref[wom], currentP)
+                    my_rank = women_ranks[wom].get(man, -1)
+                    if wom in woman_dict:  # if she is not single
+                        currentP = woman_dict[wom]
+                        currentP_rank = women_ranks[wom].get(currentP, -1)
                     else:
                         currentP_rank = -1
                     other_couple = [p for p in blocking_pairs if p[1] == wom]
@@ -81,7 +80,7 @@ def findBlockingPairs(matching, men_pref, women_pref):
                         if len(other_couple) == 0:
                             blocking_pairs.append((man, wom))
                             break
-                        elif find_index(women_pref[wom], other_couple[0][0]) > my_rank:
+                        elif women_ranks[wom].get(other_couple[0][0], -1) > my_rank:
                             blocking_pairs.append((man, wom))
                             blocking_pairs.remove(other_couple[0])
                             break
@@ -90,10 +89,10 @@ def findBlockingPairs(matching, men_pref, women_pref):
                 if blocking_pairs[-1][0] == man:
                     break
             else:
-                my_rank = find_index(women_pref[woman], man)
-                if woman in list(match_dict.values()):  # if she is not single
-                    currentP = list(match_dict.keys())[list(match_dict.values()).index(woman)]
-                    currentP_rank = find_index(women_pref[woman], currentP)
+                my_rank = women_ranks[woman].get(man, -1)
+                if woman in woman_dict:  # if she is not single
+                    currentP = woman_dict[woman]
+                    currentP_rank = women_ranks[woman].get(currentP, -1)
                 else:
                     currentP_rank = -1
                 other_couple = [p for p in blocking_pairs if p[1] == woman]
@@ -101,7 +100,7 @@ def findBlockingPairs(matching, men_pref, women_pref):
                     if len(other_couple) == 0:
                         blocking_pairs.append((man, woman))
                         break
-                    elif find_index(women_pref[woman], other_couple[0][0]) > my_rank:
+                    elif women_ranks[woman].get(other_couple[0][0], -1) > my_rank:
                         blocking_pairs.append((man, woman))
                         blocking_pairs.remove(other_couple[0])
                         break
@@ -122,6 +121,57 @@ def newStategenerator(stateM, blockingpair):
     return matching
 
 
+class Matching:
+    """
+    The matching of the current node of the search, kept in arrays indexed by
+    the agents: the partner of every man and of every woman (-1 if single),
+    and, for every man, the positions in his list of the women he would form
+    a blocking pair with if no other man claimed them (see SMTI.candidates).
+    The claims of the men on these women (see SMTI.resolve) are kept as well:
+    the women every man tries, the men trying every woman and the man who
+    keeps each woman, which form the blocking pairs.
+    Moves write these arrays in place and record the overwritten entries in an
+    undo log, so a neighbor is evaluated by a move and its undo instead of a
+    copy of the matching.
+    """
+
+    def __init__(self, msize, wsize):
+        self.partner_m = [-1] * (msize + 1)
+        self.partner_w = [-1] * (wsize + 1)
+        self.candidates = [[] for _ in range(msize + 1)]
+        self.tried = [frozenset() for _ in range(msize + 1)]
+        self.claimants = [[] for _ in range(wsize + 1)]  # sorted by man
+        self.claims = {}  # woman: man of her blocking pair
+        self.size = 0  # number of pairs
+        self.blocking_pairs = []
+        self.log = []  # (array, index, previous value), None if there was no entry
+
+    def set(self, array, index, value):
+        self.log.append((array, index, array[index]))
+        array[index] = value
+
+    def claim(self, woman, man):
+        # sets (man != -1) or removes the blocking pair of woman
+        self.log.append((self.claims, woman, self.claims.get(woman)))
+        if man == -1:
+            del self.claims[woman]
+        else:
+            self.claims[woman] = man
+
+    def undo(self, mark):
+        # restores the arrays as they were when the log had mark entries
+        log = self.log
+        while len(log) > mark:
+            array, index, value = log.pop()
+            if value is None:
+                del array[index]
+            else:
+                array[index] = value
+
+    def pairs(self):
+        return [(man, woman) for man, woman in enumerate(self.partner_m) if woman != -1]
+
+
 class Problem(object):
 
     def __init__(self, initial=None, goal=None):
@@ -150,28 +200,225 @@ class SMTI(Problem):
         self.men_pref = men_pref
         self.msize = msize
         self.wsize = wsize
+        # the women of each man in the order findBlockingPairs scans them, the
+        # position and tie group of each of them, and where each group starts
+        self.order = {}
+        self.position = {}
+        self.group_start = {}
+        for man, prefs in men_pref.items():
+            self.order[man] = []
+            self.position[man] = {}
+            self.group_start[man] = []
+            for group, women in enumerate(prefs):
+                self.group_start[man].append(len(self.order[man]))
+                for woman in (women if isinstance(women, tuple) else (women,)):
+                    self.position[man][woman] = (len(self.order[man]), group)
+                    self.order[man].append(woman)
+        # rank (tie group) of each man in the list of each woman, and the men
+        # whose list contains each woman
+        self.women_rank = tuple_ranks(women_pref)
+        self.listed_by = {woman: [] for woman in women_pref}
+        for man in men_pref:
+            for woman in self.order[man]:
+                self.listed_by.setdefault(woman, []).append(man)
 
     def actions(self, state):
-        return findBlockingPairs(state, self.men_pref, self.women_pref)
+        return self.evaluate(state).blocking_pairs
 
     def result(self, state, action):
         new_state = newStategenerator(state, action)
-        blockingPairs = findBlockingPairs(new_state, self.men_pref, self.women_pref)
-        return new_state, blockingPairs
-
-    def value(self, blp, state):  # number of undominated bp+number of singles
-        ns = self.msize - len(state)
-        ns += self.wsize - len(state)
+        return new_state, self.evaluate(new_state).blocking_pairs
+
+    def scanned(self, man, partner_m):
+        # number of women of the list of man findBlockingPairs scans: the
+        # women of the groups he prefers to his partner, all if he is single
+        partner = partner_m[man]
+        if partner == -1:
+            return len(self.order[man])
+        return self.group_start[man][self.position[man][partner][1]]
+
+    def blocks(self, man, woman, partner_w):
+        # whether woman would leave her partner (or being single) for man, as
+        # tested by findBlockingPairs, an unacceptable partner counts as single
+        ranks = self.women_rank[woman]
+        current = partner_w[woman]
+        current_rank = -1 if current == -1 else ranks.get(current, -1)
+        return current_rank == -1 or current_rank > ranks.get(man, -1)
+
+    def candidates(self, man, partner_m, partner_w):
+        # positions of the women of the list of man with whom he could form a
+        # blocking pair, in the order findBlockingPairs tries them
+        order = self.order[man]
+        return [k for k in range(self.scanned(man, partner_m))
+                if self.blocks(man, order[k], partner_w)]
+
+    def tries(self, matching, man):
+        # the women man tries when the men claim, in order, the first of their
+        # candidates not claimed yet by a man she likes as much as them: his
+        # candidates up to the first one that ranks every man before him who
+        # tried her below him
+        order = self.order[man]
+        tried = []
+        for k in matching.candidates[man]:
+            woman = order[k]
+            tried.append(woman)
+            ranks = self.women_rank[woman]
+            rank = ranks.get(man, -1)
+            for other in matching.claimants[woman]:
+                if other >= man:
+                    return frozenset(tried)
+                if ranks.get(other, -1) <= rank:
+                    break
+            else:
+                return frozenset(tried)
+        return frozenset(tried)
+
+    def holder(self, matching, woman):
+        # the man who keeps woman in the end: the first of the men who tried
+        # her among those she likes best, -1 if nobody tried her
+        ranks = self.women_rank[woman]
+        best, best_rank = -1, None
+        for man in matching.claimants[woman]:
+            rank = ranks.get(man, -1)
+            if best_rank is None or rank < best_rank:
+                best, best_rank = man, rank
+        return best
+
+    def resolve(self, matching, men):
+        # the blocking pairs of findBlockingPairs after the candidates of men
+        # changed: the men take, in order, their first candidate not claimed
+        # yet by a man she likes as much as them, a man whose woman is taken
+        # from him loses his blocking pair and does not look any further.
+        # whether a man takes a woman depends on the men before him who tried
+        # her, so only the men after him who tried the women he now tries or
+        # no longer tries are looked at again, in order
+        heap = list(set(men))
+        heapify(heap)
+        queued = set(heap)
+        while heap:
+            man = heappop(heap)
+            old, new = matching.tried[man], self.tries(matching, man)
+            if old == new:
+                continue
+            matching.set(matching.tried, man, new)
+            for woman in old ^ new:
+                holder = self.holder(matching, woman)
+                claimants = list(matching.claimants[woman])
+                if woman in new:
+                    insort(claimants, man)
+                else:
+                    claimants.remove(man)
+                matching.set(matching.claimants, woman, claimants)
+                new_holder = self.holder(matching, woman)
+                if new_holder != holder:
+                    matching.claim(woman, new_holder)
+                for other in claimants:
+                    if other > man and other not in queued:
+                        queued.add(other)
+                        heappush(heap, other)
+        return sorted((man, woman) for woman, man in matching.claims.items())
+
+    def evaluate(self, state):
+        # the matching of state with its blocking pairs. like findBlockingPairs,
+        # the pairs that are unacceptable to the man are removed from state;
+        # for such a state the blocking pairs of findBlockingPairs, which still
+        # counts the women of those pairs as matched, are kept
+        blocking_pairs = None
+        if any(self.position[man].get(woman) is None for man, woman in state):
+            blocking_pairs = findBlockingPairs(state, self.men_pref, self.women_pref)
+        matching = Matching(self.msize, self.wsize)
+        for man, woman in state:
+            matching.partner_m[man] = woman
+            matching.partner_w[woman] = man
+        matching.size = len(state)
+        for man in self.men_pref:
+            matching.candidates[man] = self.candidates(man, matching.partner_m, matching.partner_w)
+        resolved = self.resolve(matching, self.men_pref)
+        del matching.log[:]
+        matching.blocking_pairs = resolved if blocking_pairs is None else blocking_pairs
+        return matching
+
+    def move(self, matching, action):
+        # applies the blocking pair action to matching, through its undo log,
+        # and returns the change of its number of pairs and the men whose
+        # candidates changed. only the men whose
+        # partner changes (the man of the pair and the former partner of the
+        # woman) are scanned again, and for the women whose partner changes
+        # (the woman of the pair and the former partner of the man) only their
+        # entry in the candidates of the men listing them is updated
+        man, woman = action
+        partner_m, partner_w, candidates = matching.partner_m, matching.partner_w, matching.candidates
+        old_woman = partner_m[man]
+        old_man = partner_w[woman]
+        if old_woman != -1:
+            matching.set(partner_w, old_woman, -1)
+        if old_man != -1:
+            matching.set(partner_m, old_man, -1)
+        matching.set(partner_m, man, woman)
+        matching.set(partner_w, woman, man)
+        rescanned = (man, old_man)
+        changed = []
+        for m in rescanned:
+            if m != -1:
+                cands = self.candidates(m, partner_m, partner_w)
+                if cands != candidates[m]:
+                    matching.set(candidates, m, cands)
+                    changed.append(m)
+        for w in (woman, old_woman):
+            if w == -1:
+                continue
+            for m in self.listed_by[w]:
+                if m in rescanned:
+                    continue
+                k = self.position[m][w][0]
+                if k >= self.scanned(m, partner_m):
+                    continue
+                cands = candidates[m]
+                i = bisect_left(cands, k)
+                present = i < len(cands) and cands[i] == k
+                if self.blocks(m, w, partner_w) != present:
+                    cands = list(cands)
+                    if present:
+                        del cands[i]
+                    else:
+                        cands.insert(i, k)
+                    matching.set(candidates, m, cands)
+                    changed.append(m)
+        return 1 - (old_woman != -1) - (old_man != -1), changed
+
+    def neighbor(self, matching, action):
+        # blocking pairs and number of pairs of the neighbor reached by action,
+        # matching is left unchanged
+        mark = len(matching.log)
+        delta, changed = self.move(matching, action)
+        blocking_pairs = self.resolve(matching, changed)
+        matching.undo(mark)
+        return blocking_pairs, matching.size + delta
+
+    def advance(self, matching, action, blocking_pairs):
+        # moves matching to its neighbor reached by action for good
+        delta, changed = self.move(matching, action)
+        self.resolve(matching, changed)
+        matching.size += delta
+        matching.blocking_pairs = blocking_pairs
+        del matching.log[:]
+
+    def value(self, blp, size):  # number of undominated bp+number of singles
+        ns = self.msize - size
+        ns += self.wsize - size
         return len(blp) + ns
 
 
 class Node:
 
-    def __init__(self, state, bp, parent=None):
+    def __init__(self, state, bp, parent=None, action=None, size=None):
         """Create a search tree Node, derived from a parent by an action."""
-        self.state = state
+        self.state = state  # list of pairs, built when needed for the children
         self.parent = parent
+        self.action = action
         self.bp = bp  # number of undominated bp
+        self.pairs = size
+        self.matching = None  # only the node being expanded holds it
 
     def __repr__(self):
         return "<Node {}>".format(self.state)
@@ -179,14 +426,36 @@ class Node:
     """def __lt__(self, node):
       return self.state < node.state"""
 
+    def size(self):
+        """Number of pairs of the matching of the node."""
+        return len(self.state) if self.state is not None else self.pairs
+
+    def activate(self, problem):
+        """Take over the matching of the parent (or evaluate the state of a
+        root) and move it to this node."""
+        if self.matching is None:
+            if self.parent is None:
+                self.matching = problem.evaluate(self.state)
+            else:
+                self.matching, self.parent.matching = self.parent.matching, None
+                problem.advance(self.matching, self.action, self.bp)
+        return self.matching
+
+    def materialize(self, problem):
+        """Build the list of pairs of the node, to keep it after the search moves on."""
+        if self.state is None:
+            self.state = self.activate(problem).pairs()
+        return self
+
     def expand(self, problem):
         """List the nodes reachable in one step from this node."""
+        matching = self.activate(problem)
         return [self.child_node(problem, action)
-                for action in problem.actions(self.state)]
+                for action in matching.blocking_pairs]
 
     def child_node(self, problem, action):
-        next_state, next_bp = problem.result(self.state, action)
-        next_node = Node(next_state, next_bp, self)
+        next_bp, next_size = problem.neighbor(self.matching, action)
+        next_node = Node(None, next_bp, self, action, next_size)
         return next_node
 
     def solution(self):
@@ -202,36 +471,64 @@ class Node:
         return list(reversed(path_back))
 
 
-def hill_climbing(problem):
-    iterations = 50000  # kaç yapmak istersek
+def hill_climbing(problem, incumbent=None, iterations=50000, time_limit=1990, p=0.8, callback=None):
+    # at most iterations steps and time_limit seconds; each step moves to a best
+    # neighbor with probability p and to a random one otherwise.
+    # callback is called with a dict (time since the start, step, value,
+    # blocking_pairs, singles, stable) every time the best or the best stable
+    # matching improves, and stops the search if it returns True.
+    # incumbent (a SharedIncumbent) is offered every improvement and stops the
+    # search once another search has found a perfect stable matching
+    budget = iterations
+    start = time.time()
+
+    def improved(node, val):
+        if incumbent is not None:
+            incumbent.offer(node, val)
+        if callback is None:
+            return False
+        return callback(dict(time=time.time() - start, step=budget - iterations, value=val,
+                             blocking_pairs=len(node.bp),
+                             singles=problem.msize + problem.wsize - 2 * node.size(),
+                             stable=not node.bp))
+
     TOTAL_TIME = 0
     current = Node(problem.initial, findBlockingPairs(problem.initial, problem.men_pref, problem.women_pref))
     best_stable_node_so_far = None
     best_node_so_far = current
-    while TOTAL_TIME < 1990 and iterations:
+    best_value = None
+    stop = False
+    while TOTAL_TIME < time_limit and iterations and not stop:
         # print("------------------------------")
         # print("iteration number: ",iterations)
+        if incumbent is not None and incumbent.stopped():
+            break
         START_TIME = time.time()
-        val = problem.value(current.bp, current.state)
-        if val == 0:
-            return current, 50000 - iterations
-        if val < problem.value(best_node_so_far.bp, best_node_so_far.state):  # update best node so far
-            best_node_so_far = current
+        val = problem.value(current.bp, current.size())
+        if best_value is None or val < best_value:  # update best node so far
+            best_node_so_far = current.materialize(problem)
+            best_value = val
+            stop = improved(best_node_so_far, val)
+            if val == 0:
+                return best_node_so_far, budget - iterations
+            if stop:
+                break
         neighbors = current.expand(problem)
         if not neighbors:  # we already now it is not perfect but if no neighbors then ramdom restart to find perfect matching
             if best_stable_node_so_far == None or val < problem.value(best_stable_node_so_far.bp,
-                                                                      best_stable_node_so_far.state):
-                best_stable_node_so_far = current
-            current = Node(match(problem.msize, problem.wsize),
-                           findBlockingPairs(problem.initial, problem.men_pref, problem.women_pref))
+                                                                      best_stable_node_so_far.size()):
+                best_stable_node_so_far = current.materialize(problem)
+                stop = improved(best_stable_node_so_far, val)
+            restart = match(problem.msize, problem.wsize)
+            current = Node(restart, findBlockingPairs(restart, problem.men_pref, problem.women_pref))
         else:
-            values = [problem.value(node.bp, node.state) for node in neighbors]
+            values = [problem.value(node.bp, node.size()) for node in neighbors]
             # print("values of neighbor: ",values)
             minimum = min(values)
             indices = [i for i, v in enumerate(values) if v == minimum]
             neighbor = neighbors[random.choice(indices)]
             # print("chosen neighbor: ",neighbor,"its value is: ",problem.value(neighbor.bp,neighbor.state))
-            if random.random() < 0.8:
+            if random.random() < p:
                 current = neighbor
             else:
                 current = neighbors[random.randrange(0, len(neighbors))]
@@ -239,16 +536,130 @@ def hill_climbing(problem):
         LOOP_TIME = time.time()
         TOTAL_TIME += LOOP_TIME - START_TIME
     if best_stable_node_so_far != None:
-        return best_stable_node_so_far, 50000 - iterations  # if couldnt find a perfect match after iterations return best stable so far
+        return best_stable_node_so_far, budget - iterations  # if couldnt find a perfect match after iterations return best stable so far
     else:
-        print("printed best so far", "left iterations", iterations)
-        return best_node_so_far, 50000 - iterations
+        if not stop and (incumbent is None or not incumbent.stopped()):
+            print("printed best so far", "left iterations", iterations)
+        return best_node_so_far, budget - iterations
+
+
+class SharedIncumbent:
+    """
+    The best matching found by the searches of a multi-start run, kept in
+    shared memory so that every process sees it: the partner of every man
+    (-1 if single) and its key (0 if it is stable else 1, value), compared as
+    hill_climbing compares its results, a stable matching before any other
+    and then the fewest blocking pairs plus singles. Once a search finds a
+    perfect stable matching (key (0, 0)) all the searches stop.
+    If improvements (a multiprocessing.SimpleQueue) is given, every
+    improvement is put in it as (time, stable, value, blocking pairs, pairs).
+    """
+
+    def __init__(self, msize, improvements=None):
+        self.lock = multiprocessing.Lock()
+        self.improvements = improvements
+        self.key = multiprocessing.Array('i', [2, 0], lock=False)  # 2: nothing offered yet
+        self.partners = multiprocessing.Array('i', [-1] * (msize + 1), lock=False)
+        self.found = multiprocessing.Event()
+
+    def offer(self, node, value):
+        key = [1 if node.bp else 0, value]
+        with self.lock:
+            if key < self.key[:]:
+                partners = [-1] * len(self.partners)
+                for man, woman in node.state:
+                    partners[man] = woman
+                self.partners[:] = partners
+                self.key[:] = key
+                if self.improvements is not None:
+                    self.improvements.put((time.time(), not node.bp, value, len(node.bp), node.size()))
+        if key == [0, 0]:
+            self.found.set()
+
+    def stop(self):
+        self.found.set()
+
+    def stopped(self):
+        return self.found.is_set()
+
+    def best(self):
+        """(stable, value, pairs) of the best matching, None if nothing was offered."""
+        with self.lock:
+            if self.key[0] == 2:
+                return None
+            return (self.key[0] == 0, self.key[1],
+                    [(man, woman) for man, woman in enumerate(self.partners) if woman != -1])
+
+
+# the instance and the incumbent of the processes of multi_start
+worker_search = {}
+
+
+def init_search_worker(men_pref, women_pref, msize, wsize, incumbent, options):
+    worker_search.update(men_pref=men_pref, women_pref=women_pref, msize=msize,
+                         wsize=wsize, incumbent=incumbent, options=options)
+
+
+def run_start(seed):
+    # one search of multi_start from a random matching, returns its number of steps
+    incumbent = worker_search['incumbent']
+    if incumbent.stopped():
+        return 0
+    random.seed(seed)
+    msize, wsize = worker_search['msize'], worker_search['wsize']
+    problem = SMTI(match(msize, wsize), worker_search['women_pref'], worker_search['men_pref'], msize, wsize)
+    node, steps = hill_climbing(problem, incumbent, **worker_search['options'])
+    incumbent.offer(node, problem.value(node.bp, node.size()))
+    return steps
+
+
+def multi_start(men_pref, women_pref, msize, wsize, starts, workers=None, seed=None, callback=None, **options):
+    """
+    Run starts independent searches (hill_climbing from a random matching,
+    search i seeded with seed + i, with the budgets in options) over a pool
+    of workers processes, one per CPU by default. callback is called in this
+    process with a dict (time since the start, value, blocking_pairs,
+    singles, stable) every time the best matching of all the searches
+    improves, and stops them all if it returns True. Returns the best
+    matching found, as given by SharedIncumbent.best, and the total number
+    of steps of the searches.
+    """
+    if seed is None:
+        seed = random.randrange(2 ** 31)
+    improvements = multiprocessing.SimpleQueue() if callback is not None else None
+    incumbent = SharedIncumbent(msize, improvements)
+    start = time.time()
+    with multiprocessing.Pool(workers, initializer=init_search_worker,
+                              initargs=(men_pref, women_pref, msize, wsize, incumbent, options)) as pool:
+        result = pool.map_async(run_start, [seed + i for i in range(starts)], chunksize=1)
+        # the improvements are put in the queue before the searches return,
+        # so it is drained once they are all done
+        while improvements is not None and not (result.ready() and improvements.empty()):
+            if improvements.empty():
+                result.wait(0.05)
+                continue
+            t, stable, value, bp, pairs = improvements.get()
+            if callback(dict(time=t - start, value=value, blocking_pairs=bp,
+                             singles=msize + wsize - 2 * pairs, stable=stable)):
+                incumbent.stop()
+        steps = sum(result.get())
+    return incumbent.best(), steps
 
 
 def main():
     argparser = argparse.ArgumentParser()
     argparser.add_argument('--file', '-f', metavar='', help='Input file name', type = str)
+    argparser.add_argument('--starts', '-s', metavar='', help='Number of independent searches (default 1)', type=int, default=1)
+    argparser.add_argument('--workers', '-w', metavar='', help='Number of processes of the searches (default: number of CPUs)', type=int)
+    argparser.add_argument('--seed', metavar='', help='Random seed (search i of --starts uses seed + i)', type=int)
+    argparser.add_argument('--iterations', '-i', metavar='', help='Maximum number of steps of a search (default 50000)', type=int, default=50000)
+    argparser.add_argument('--time', '-t', metavar='', help='Time limit of a search in seconds (default 1990)', type=float, default=1990)
+    argparser.add_argument('--p', '-p', metavar='', help='Probability of moving to a best neighbor rather than a random one (default 0.8)', type=float, default=0.8)
+    argparser.add_argument('--target', metavar='', help='Stop once the number of blocking pairs plus singles is at most target', type=int)
+    argparser.add_argument('--trace', metavar='', help='JSONL file of the improvements of the best matching, with their times', type=str)
     args = argparser.parse_args()
+    if args.starts < 1 or (args.workers is not None and args.workers < 1):
+        argparser.error("--starts and --workers must be at least 1")
 
     inputF = ""
     if not args.file:  # in this case there is only sys.argv[0] which the is the name of the python file
@@ -257,61 +668,55 @@ def main():
     else:
         inputF = args.file
 
-    with open(inputF) as fp:
-        lines = fp.readlines()
-
-    mensize = int(lines[1])
-    womensize = int(lines[2])
-    menprefDict = {key: [] for key in range(1, int(mensize) + 1)}
-    womenprefDict = {key: [] for key in range(1, int(womensize) + 1)}
-    for line in lines[3:int(mensize) + 3]:
-        preferencesM = line.split()
-        tupl = []
-        for p in range(1, len(preferencesM)):
-            if '(' in preferencesM[p] and ')' in preferencesM[p]:
-                menprefDict[int(preferencesM[0])].append(int(preferencesM[p][1:-1]))
-            elif ')' in preferencesM[p]:
-                tupl.append(int(preferencesM[p][:-1]))
-                menprefDict[int(preferencesM[0])].append(tuple(tupl))
-                tupl = []
-            else:
-                if '(' in preferencesM[p]:
-                    tupl.append(int(preferencesM[p][1:]))
-                else:
-                    tupl.append(int(preferencesM[p]))
-
-    for line in lines[int(mensize) + 3:]:
-        preferencesW = line.split()
-        tupl = []
-        for p in range(1, len(preferencesW)):
-            if '(' in preferencesW[p] and ')' in preferencesW[p]:
-                womenprefDict[int(preferencesW[0])].append(int(preferencesW[p][1:-1]))
-            elif ')' in preferencesW[p]:
-                tupl.append(int(preferencesW[p][:-1]))
-                womenprefDict[int(preferencesW[0])].append(tuple(tupl))
-                tupl = []
-            else:
-                if '(' in preferencesW[p]:
-                    tupl.append(int(preferencesW[p][1:]))
-                else:
-                    tupl.append(int(preferencesW[p]))
-
-    smti = SMTI(match(mensize, womensize), womenprefDict, menprefDict, mensize, womensize)
-    # print("initial state is",smti.initial)
-    # print("men preferences are",menprefDict)
-    # print("women preferences are",womenprefDict)
-    sTime = time.time()
-    node, numIterations = hill_climbing(smti)
-    eTime = time.time()
+    instance = SMTIInstance.from_file(inputF)
+    mensize = instance.n_men
+    womensize = instance.n_women
+    menprefDict = instance.men.tuple_dict()
+    womenprefDict = instance.women.tuple_dict()
+
+    trace = open(args.trace, 'w') if args.trace else None
+
+    def improvement(event):
+        if trace is not None:
+            trace.write(json.dumps(event) + "\n")
+            trace.flush()
+        return args.target is not None and event['value'] <= args.target
+
+    callback = improvement if trace is not None or args.target is not None else None
+    options = dict(iterations=args.iterations, time_limit=args.time, p=args.p)
+
+    if args.starts > 1 or args.workers is not None:
+        sTime = time.time()
+        (stable, value, pairs), numIterations = multi_start(menprefDict, womenprefDict, mensize, womensize,
+                                                            args.starts, args.workers, args.seed,
+                                                            callback, **options)
+        eTime = time.time()
+        numSingles = mensize + womensize - 2 * len(pairs)
+        numBP = value - numSingles
+    else:
+        if args.seed is not None:
+            random.seed(args.seed)
+        smti = SMTI(match(mensize, womensize), womenprefDict, menprefDict, mensize, womensize)
+        # print("initial state is",smti.initial)
+        # print("men preferences are",menprefDict)
+        # print("women preferences are",womenprefDict)
+        sTime = time.time()
+        node, numIterations = hill_climbing(smti, callback=callback, **options)
+        eTime = time.time()
+        pairs = node.state
+        numSingles = smti.msize + smti.wsize - (2 * len(node.state))
+        numBP = len(node.bp)
     timePassed = eTime - sTime
+    if trace is not None:
+        trace.close()
 
     print("%s" % ("Run time: " + str(timePassed)))
     print("Number of steps: " + str(numIterations))
-    print("%s" % ("Number of blocking pairs: " + str(len(node.bp))))
-    print("%s" % ("Number of singles: " + str(smti.msize + smti.wsize - (2 * len(node.state)))))
+    print("%s" % ("Number of blocking pairs: " + str(numBP)))
+    print("%s" % ("Number of singles: " + str(numSingles)))
 
     print("\nSolution:")
-    for pair in node.state:
+    for pair in pairs:
         print("%s" % str(pair))
 
 
@@ -2,16 +2,11 @@ import time
 from ortools.sat.python import cp_model
 import argparse
 import os
+import sys
 import numpy as np
 
-def flatten(preflis):
-    '''
-    flatten the prefence list by breaking ties (preserving the order of the input)
-    '''
-    li = []
-    for el in preflis:
-        li.extend([int(x) for x in el.split(' ')])
-    return li
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from smti_instance import SMTIInstance
 
 class SolutionPrinter(cp_model.CpSolverSolutionCallback):
     def __init__(self, x, y):
@@ -28,90 +23,46 @@ class SolutionPrinter(cp_model.CpSolverSolutionCallback):
 
 
 class Instance:
-    def __init__(self, manList, womanList):
-        self.manList = manList
-        self.womanList = womanList
+    def __init__(self, instance):
+        self.instance = instance
         self.pc_sum = 0
         self.log_sum = 0
-        self.numberOfMan = len(manList.keys())
-        self.numberOfWoman = len(womanList.keys())
+        self.numberOfMan = instance.n_men
+        self.numberOfWoman = instance.n_women
 
     def getAcceptableMenSet(self, womanID):
         ''' checks the acceptable set of woman with wIndex '''
-        d = set()
-        for el in self.womanList[womanID]:
-            for x in el.split(' '):
-                d.add(int(x))
-        return list(d)
+        return self.instance.women.pref_list(womanID).tolist()
 
     def getAcceptableWomenSet(self, manID):
         ''' checks the acceptable set of man with mIndex '''
-        d = set()
-        for el in self.manList[manID]:
-            for x in el.split(' '):
-                d.add(int(x))
-        return list(d)
+        return self.instance.men.pref_list(manID).tolist()
 
-    def nextMan(self, manID, womanID):
-        ''' get the next man to manID in the preference list of womanID '''
-        plis = self.manList[manID]
-        for idx, x in enumerate(plis):
-            d = [int(z) for z in x.split(' ')]
-            if womanID in d and idx + 1 != len(plis):
-                return plis[idx + 1]
-        return -1
-
-    def nextWoman(self, manID, womanID):
-        ''' get the next woman to womanID in the preference list of manID '''
-        plis = self.womanList[womanID]
-        for idx, x in enumerate(plis):
-            d = [int(z) for z in x.split(' ')]
-            if manID in d and idx + 1 != len(plis):
-                return plis[idx + 1]
-        return -1
+    def nextGroupStart(self, table, agent, other):
+        ''' position of the tie group after the one of other in the flattened list of agent, -1 if there is none '''
+        rank = table.rank(agent, other)
+        if rank == table.num_groups(agent):
+            return -1
+        return int(table.gbound[table.gptr[agent - 1] + rank] - table.ptr[agent - 1])
 
     def findNext(self, manID, womanID):
         ''' 
         find next tie group of manID's list to womanID
         find for womanID and return them as a tuple
          '''
-        next = self.nextMan(manID, womanID)
-        if next == -1:
-            b1 = next
-        elif len(next.split(' ')) == 1:
-            b1 = flatten(self.manList[manID]).index(int(next))
-        elif len(next.split(' ')) > 1:
-            b1 = flatten(self.manList[manID]).index(int(next.split(' ')[0]))
-
-        next = self.nextWoman(manID, womanID)
-        if next == -1:
-            b2 = next
-        elif len(next.split(' ')) == 1:
-            b2 = flatten(self.womanList[womanID]).index(int(next))
-        elif len(next.split(' ')) > 1:
-            b2 = flatten(self.womanList[womanID]).index(int(next.split(' ')[0]))
-
+        b1 = self.nextGroupStart(self.instance.men, manID, womanID)
+        b2 = self.nextGroupStart(self.instance.women, womanID, manID)
         return b1, b2
 
-    def isManInWomanList(self, manID, womanID):
-        ''' checks if man with manID is in womanID's list, returns the rank '''
-        if manID in self.getAcceptableMenSet(womanID):
-            for idx, el in enumerate(self.womanList[womanID]):
-                d = [int(x) for x in el.split(' ')]
-                if manID in d:
-                    return True, idx
-        else:
-            return False, -1
-
-    def isWomanInManList(self, manID, womanID):
-        ''' checks if woman with womanID is in manID's list, returns the rank '''
-        if womanID in self.getAcceptableWomenSet(manID):
-            for idx, el in enumerate(self.manList[manID]):
-                d = [int(x) for x in el.split(' ')]
-                if womanID in d:
-                    return True, idx
-        else:
-            return False, -1
+    def acceptablePairs(self):
+        '''
+        (man, woman, 0-based rank of the woman for the man, 0-based rank of the man for the woman)
+        of every mutually acceptable pair, ordered by man and woman id, see PairIndex in smti_instance.py
+        '''
+        pairs = self.instance.pairs
+        order = np.lexsort((pairs.woman, pairs.man))
+        return zip(pairs.man[order].tolist(), pairs.woman[order].tolist(),
+                   (pairs.mrank[order] - 1).tolist(), (pairs.wrank[order] - 1).tolist())
 
     def createModel(self):
         m = cp_model.CpModel()
@@ -124,60 +75,42 @@ class Instance:
         for wIndex in range(1, self.numberOfWoman+1):
             y[wIndex] = m.NewIntVarFromDomain(cp_model.Domain.FromValues(self.getAcceptableMenSet(wIndex)), name='w{}'.format(wIndex))
             self.log_sum += round(np.log2(len(self.getAcceptableMenSet(wIndex))),5)
-        for mIndex in range(1, self.numberOfMan+1):
-            for wIndex in range(1, self.numberOfWoman+1):
-                mwi, i = self.isWomanInManList(mIndex, wIndex)
-                wmi, j = self.isManInWomanList(mIndex, wIndex)
-                if mwi and wmi:
-                    # eliminate illegal marriages
-                    # vertical
-                    mpref = flatten(self.manList[mIndex])
-                    wpref = flatten(self.womanList[wIndex])
-                    updatedi = mpref.index(wIndex)
-                    updatedj = wpref.index(mIndex)
-                    # constrainedness value for pair (x_i,y_j)
-                    pc = round(np.log2(1 - 1 / (len(mpref) * len(wpref))),5)
-                    for k in range(len(mpref)):
-                        if k != updatedi:
-                            self.pc_sum += pc
-                            m.AddForbiddenAssignments([x[mIndex], y[wIndex]], [(mpref[k], mIndex)])
-
-                    # horizontal
-                    for l in range(len(wpref)):
-                        if l != updatedj:
-                            self.pc_sum += pc
-                            m.AddForbiddenAssignments([y[wIndex], x[mIndex]], [(wpref[l], wIndex)])
-
-                    # eliminate blocking pairs
-                    # find next elements in the pref lists of i and j
-                    b1, b2 = self.findNext(mIndex, wIndex)
-                    if b1 != -1 and b2 != -1:
-                        for k in range(b1, len(mpref)):
-                            for l in range(b2, len(wpref)):
-                                self.pc_sum += pc
-                                m.AddForbiddenAssignments([y[wIndex], x[mIndex]], [(wpref[l], mpref[k])])
+        # preference lists, and the position of every partner in them
+        mprefs = {mIndex: self.getAcceptableWomenSet(mIndex) for mIndex in range(1, self.numberOfMan+1)}
+        wprefs = {wIndex: self.getAcceptableMenSet(wIndex) for wIndex in range(1, self.numberOfWoman+1)}
+        mpos = {mIndex: {w: k for k, w in enumerate(mpref)} for mIndex, mpref in mprefs.items()}
+        wpos = {wIndex: {m: l for l, m in enumerate(wpref)} for wIndex, wpref in wprefs.items()}
+        for mIndex, wIndex, mr, wr in self.acceptablePairs():
+            # eliminate illegal marriages
+            # vertical
+            mpref = mprefs[mIndex]
+            wpref = wprefs[wIndex]
+            updatedi = mpos[mIndex][wIndex]
+            updatedj = wpos[wIndex][mIndex]
+            # constrainedness value for pair (x_i,y_j)
+            pc = round(np.log2(1 - 1 / (len(mpref) * len(wpref))),5)
+            for k in range(len(mpref)):
+                if k != updatedi:
+                    self.pc_sum += pc
+                    m.AddForbiddenAssignments([x[mIndex], y[wIndex]], [(mpref[k], mIndex)])
+
+            # horizontal
+            for l in range(len(wpref)):
+                if l != updatedj:
+                    self.pc_sum += pc
+                    m.AddForbiddenAssignments([y[wIndex], x[mIndex]], [(wpref[l], wIndex)])
+
+            # eliminate blocking pairs
+            # find next elements in the pref lists of i and j
+            b1, b2 = self.findNext(mIndex, wIndex)
+            if b1 != -1 and b2 != -1:
+                for k in range(b1, len(mpref)):
+                    for l in range(b2, len(wpref)):
+                        self.pc_sum += pc
+                        m.AddForbiddenAssignments([y[wIndex], x[mIndex]], [(wpref[l], mpref[k])])
         return m, x, y
 
 
-def generateRankList(preferencesInLine):
-    ''' 
-    it will get preferences in input file 
-    and convert it into a ranked list so that 
-    we can put the ranks in the preference list
-    '''
-    result = []
-
-    while len(preferencesInLine) != 0:
-        leftPar = "("
-        rightPar = ")"
-
-        element = preferencesInLine[preferencesInLine.find(leftPar) + 1: preferencesInLine.find(rightPar)]
-        result.append(element)
-
-        preferencesInLine = preferencesInLine[preferencesInLine.find(rightPar) + 1:]
-    return result
-
-
 def main():
     argparser = argparse.ArgumentParser()
     argparser.add_argument('--file', '-f', metavar='', help='Input file name', type = str)
@@ -198,41 +131,11 @@ def main():
     else:
         outputFileName = args.output
 
-    f = open(inputFileName, "r")  # Read the input file
-    lines = f.readlines()
-    f.close()
-
-    numberOfMan = int(lines[1])
-    numberOfWoman = int(lines[2])
-
-    ManList = {} # np.empty(numberOfMan, dtype=object)
-    WomanList = {} # np.empty(numberOfWoman, dtype=object)
-
-    for i in range(3, 3 + numberOfMan):
-        line = lines[i]  # line = "ID Preferences"
-        line = line.replace("\n", "")  # getting rid of \n character at the end of the line
-        line = line.rstrip()  # getting rid of whitepace at the end of the line
-        line = line.split(" ", 1)  # line = [ID, Preferences]
-        id = int(line[0])  # this is the id of man or woman
-
-        preferenceList = generateRankList(line[1])  
-
-        # preferenceList will have a value ['x y z'] or ['x', 'y', 'z'] or ['x y', 'z']. 
-        ManList[id] = preferenceList
-
-    for i in range(3 + numberOfMan, 3 + numberOfMan + numberOfWoman):
-        line = lines[i]  # line = "ID Preferences"
-        line = line.replace("\n", "")  # getting rid of \n character at the end of the line
-        line = line.rstrip()  # getting rid of whitepace at the end of the line
-        line = line.split(" ", 1)  # line = [ID, Preferences]
-        id = int(line[0])  # this is the id of man or woman
-
-        preferenceList = generateRankList(line[1])  # line[1] is the rest of the line and it has the form "(x y z)" or "(x) (y) (z)" or "(x y) (z)" ...
-        
-        # preferenceList will have a value ['x y z'] or ['x', 'y', 'z'] or ['x y', 'z']. Each of this ids in indices of this list will be their rank in preference list
-        WomanList[id] = preferenceList
+    instance = SMTIInstance.from_file(inputFileName)
+    numberOfMan = instance.n_men
+    numberOfWoman = instance.n_women
 
-    i = Instance(ManList, WomanList)
+    i = Instance(instance)
     model, x, y = i.createModel()
     kappa = -1 * (i.pc_sum)/(i.log_sum)
     solver = cp_model.CpSolver()
@@ -0,0 +1,86 @@
+'''
+Compares the encodings of the stability clauses of SAT-E (see --stability of
+smti.py) on the benchmark suites: for every instance and encoding, the size
+of the formula, the time to encode it and, unless --formulate is given, the
+time to solve it in process with PySAT. One CSV row is written per instance
+and encoding, and the totals of every suite and encoding are printed.
+
+e.g. python3 SAT-E/benchmark_stability.py benchmark-instances-50 benchmark-instances-100 -opt 0 -o stability.csv
+'''
+import argparse
+import csv
+import os
+import sys
+import time
+
+import smti
+
+FIELDS = ['suite', 'instance', 'stability', 'vars', 'clauses', 'literals',
+          'encoding_time', 'solving_time', 'matched']
+
+
+def benchmark(filename, opt, stability, solve=True, amo='pairwise',
+              pysat_solver=smti.PYSAT_SOLVER):
+    # one row of the CSV (without suite and instance) for the instance in filename
+    problem = smti.ProblemInstance.from_file(filename)
+    start_time = time.time()
+    constraints, res_match, variable_registry = problem.encode(
+        opt, amo=amo, stability=stability)
+    row = dict(stability=stability, vars=constraints.num_vars,
+               clauses=len(constraints),
+               literals=len(constraints.literals) + len(constraints.soft_literals),
+               encoding_time=time.time() - start_time)
+    if solve:
+        start_time = time.time()
+        model = constraints.solve(opt, pysat_solver)
+        row['solving_time'] = time.time() - start_time
+        if model is not None:
+            matching = problem.decode_matching(model, variable_registry)
+            row['matched'] = sum(1 for w in matching.values()
+                                 if w != smti.NIL_WOMAN_UID)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('suites', nargs='*', help='directories of instances',
+                        default=['benchmark-instances-50', 'benchmark-instances-100'])
+    parser.add_argument('-opt', choices=['0', '1', '2'], default='0',
+                        help='0 for SMTI, 1 for Max Cardinality SMTI and 2 for Egalitarian SMTI')
+    parser.add_argument('--stability', nargs='+', choices=smti.STABILITY_ENCODINGS,
+                        default=smti.STABILITY_ENCODINGS)
+    parser.add_argument('--amo', choices=smti.AMO_ENCODINGS, default='pairwise')
+    parser.add_argument('--pysat_solver', default=smti.PYSAT_SOLVER)
+    parser.add_argument('--formulate', action='store_true', help='only encode the instances')
+    parser.add_argument('-limit', type=int, help='number of instances taken from each suite')
+    parser.add_argument('-o', '--output', help='CSV file of the rows', default='stability.csv')
+    args = parser.parse_args()
+
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for suite in args.suites:
+            totals = {stability: dict(clauses=0, literals=0, encoding_time=0.0,
+                                      solving_time=0.0)
+                      for stability in args.stability}
+            instances = sorted(os.listdir(suite))[:args.limit]
+            for instance in instances:
+                for stability in args.stability:
+                    row = benchmark(os.path.join(suite, instance), int(args.opt),
+                                    stability, solve=not args.formulate,
+                                    amo=args.amo, pysat_solver=args.pysat_solver)
+                    for key in totals[stability]:
+                        totals[stability][key] += row.get(key, 0)
+                    row.update(suite=suite, instance=instance)
+                    writer.writerow(row)
+                f.flush()
+            for stability in args.stability:
+                total = totals[stability]
+                print('%s %s: %d instances, %d clauses, %d literals, encoding %.2fs, solving %.2fs' % (
+                    suite, stability, len(instances), total['clauses'], total['literals'],
+                    total['encoding_time'], total['solving_time']))
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
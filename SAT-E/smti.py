@@ -27,20 +27,41 @@ WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 from __future__ import with_statement
 
 import argparse
-from cgi import print_environ
+from array import array
+import math
 import os
 import subprocess
-import string
 import re
+import shutil
+import sys
 import time
 
-man_dict = {}
-woman_dict = {}
-couple_dict = {}
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from smti_instance import SMTIInstance
+from instance_cache import default_cache
 
 NIL_WOMAN_UID = 999999
 NIL_WOMAN_SYMBOL = "-1"
 TREEMEM_LIM = "12000"
+# solver of the pysat backend, see ConstraintsBuffer.solve
+PYSAT_SOLVER = 'g4'
+# bump when the formulas of ProblemInstance.encode (as written by
+# ConstraintsBuffer.write) change, see instance_cache.py
+ENCODING_VERSION = 1
+AMO_ENCODINGS = ['pairwise', 'sequential', 'ladder', 'commander', 'product']
+# lists up to this length are always encoded pairwise, which is smaller
+AMO_PAIRWISE_MAX = 4
+AMO_GROUP_SIZE = 3
+# soft clauses of the egalitarian formula (opt=2): pairs weighs every mutually
+# acceptable pair, ranks uses unit soft clauses on rank threshold indicators
+EGAL_ENCODINGS = ['pairs', 'ranks']
+# how Max Cardinality SMTI (opt=1) is solved: maxsat solves the WCNF, linear
+# and binary search the number of single men with a cardinality constraint
+MAXCARD_SEARCHES = ['maxsat', 'linear', 'binary']
+# stability clauses: chain uses the q chain of every woman and one clause per
+# pair over the weakly preferred women of the man, order uses literals
+# "partner of rank r or better" of both sides and one binary clause per pair
+STABILITY_ENCODINGS = ['chain', 'order']
 
 
 def combinations(iterable, r):
@@ -75,18 +96,106 @@ def product(*args, **kwds):
         yield tuple(prod)
 
 
-class UIDAllocator():
-    def __init__(self, first_uid=None):
-        self.last_uid = first_uid - 1
+def at_most_one(constraints, lits, new_var, encoding='pairwise'):
+    # adds clauses allowing at most one of lits to be true. pairwise needs
+    # k(k-1)/2 clauses for k literals, the other encodings O(k) clauses on
+    # auxiliary variables taken from new_var(): sequential counter (Sinz 2005),
+    # ladder (Gent & Nightingale 2004), commander (Klieber & Kwon 2007) and
+    # product (Chen 2010)
+    k = len(lits)
+    if encoding == 'pairwise' or k <= AMO_PAIRWISE_MAX:
+        for (a, b) in combinations(lits, 2):
+            constraints.append([-a, -b])
+    elif encoding == 'sequential':
+        # s[i] is true if one of lits[0..i] is true
+        s = [new_var() for _ in range(k - 1)]
+        constraints.append([-lits[0], s[0]])
+        for i in range(1, k - 1):
+            constraints.append([-lits[i], s[i]])
+            constraints.append([-s[i - 1], s[i]])
+            constraints.append([-lits[i], -s[i - 1]])
+        constraints.append([-lits[k - 1], -s[k - 2]])
+    elif encoding == 'ladder':
+        # y[i] is true if the true literal comes after lits[i], the y's form
+        # a ladder: y[i + 1] implies y[i]
+        y = [new_var() for _ in range(k - 1)]
+        for i in range(k - 2):
+            constraints.append([-y[i + 1], y[i]])
+        for i in range(k):
+            if i > 0:
+                constraints.append([-lits[i], y[i - 1]])
+            if i < k - 1:
+                constraints.append([-lits[i], -y[i]])
+    elif encoding == 'commander':
+        # at most one literal per group, a group with a true literal sets its
+        # commander, and at most one commander is true
+        commanders = []
+        for g in range(0, k, AMO_GROUP_SIZE):
+            group = lits[g:g + AMO_GROUP_SIZE]
+            if len(group) == 1:
+                commanders.append(group[0])
+                continue
+            c = new_var()
+            at_most_one(constraints, group, new_var)
+            for x in group:
+                constraints.append([-x, c])
+            commanders.append(c)
+        at_most_one(constraints, commanders, new_var, encoding)
+    elif encoding == 'product':
+        # lits are laid out on a grid, a true literal sets its row and its
+        # column, and at most one row and one column are true
+        cols = int(math.ceil(math.sqrt(k)))
+        rows = int(math.ceil(k / float(cols)))
+        row_vars = [new_var() for _ in range(rows)]
+        col_vars = [new_var() for _ in range(cols)]
+        for i, x in enumerate(lits):
+            constraints.append([-x, row_vars[i // cols]])
+            constraints.append([-x, col_vars[i % cols]])
+        at_most_one(constraints, row_vars, new_var, encoding)
+        at_most_one(constraints, col_vars, new_var, encoding)
+    else:
+        raise Exception('unknown at-most-one encoding: %r' % encoding)
+
+
+class VariableRegistry():
+    # allocates the variables of a formula and records what each one stands
+    # for in three parallel arrays indexed by the variable: its kind (an
+    # index into KINDS) and two integers, the man and woman uids of a
+    # matching variable xr, the woman uid and rank of a q variable, and
+    # the man or woman uid and rank of an order literal ym or yw, and
+    # nothing for the auxiliary variables (at-most-one encodings and the
+    # rank indicators a)
+    KINDS = ('xr', 'q', 'amo', 'a', 'ym', 'yw')
+    XR, Q, AMO, A, YM, YW = range(6)
 
-    def allocate_uid(self):
-        if self.last_uid is None:
-            self.last_uid = 0
-        else:
-            self.last_uid = self.last_uid + 1
-        return self.last_uid
+    def __init__(self):
+        # index 0 is not a variable
+        self.kind = array('b', [-1])
+        self.first = array('i', [0])
+        self.second = array('i', [0])
+
+    def __len__(self):
+        return len(self.kind) - 1
+
+    def new_var(self, kind, first=0, second=0):
+        self.kind.append(kind)
+        self.first.append(first)
+        self.second.append(second)
+        return len(self.kind) - 1
+
+    def name(self, var):
+        # the name of the variable in the verbose output, var itself if it
+        # is not registered
+        if not 0 < var < len(self.kind):
+            return str(var)
+        kind = self.kind[var]
+        if kind not in (self.AMO, self.A):
+            return '%s_%d,%d' % (self.KINDS[kind], self.first[var], self.second[var])
+        return '%s_%d' % (self.KINDS[kind], var)
 
 class PreferenceFunction():
+    __slots__ = ()
+
     def get_all_weakly_preferred(self, uid):
         raise Exception('must override in subclass')
 
@@ -97,18 +206,32 @@ class PreferenceFunction():
         raise Exception('must override in subclass')
 
 class ListPreferenceFunction(PreferenceFunction):
+    # internal_list maps the ranks, in increasing order, to the tie groups.
+    # the rank of each agent and the positions where each tie group starts
+    # and ends in the flattened list are computed once, so every lookup takes
+    # O(1) time plus the length of the list it returns
+    __slots__ = ('internal_list', 'acceptable', 'ranks', 'starts', 'ends')
+
     def __init__(self, internal_list):
         self.internal_list = internal_list
+        self.acceptable = []
+        self.ranks = {}
+        self.starts = {}
+        self.ends = {}
+        for rank in internal_list:
+            self.starts[rank] = len(self.acceptable)
+            for uid in internal_list[rank]:
+                self.ranks.setdefault(uid, rank)
+            self.acceptable.extend(internal_list[rank])
+            self.ends[rank] = len(self.acceptable)
 
     # returns list of agents that are strictly preferred over agent with uid
     def get_all_preferred(self, uid):
-        preferred = []
-        for rank in self.internal_list:
-            if uid in self.internal_list[rank]:
-                return preferred
-            preferred.extend(self.internal_list[rank])
-        raise Exception('uid not in preference list: %r; internal_list; %r'
-                        % (uid, self.internal_list))
+        rank = self.ranks.get(uid)
+        if rank is None:
+            raise Exception('uid not in preference list: %r; internal_list; %r'
+                            % (uid, self.internal_list))
+        return self.acceptable[:self.starts[rank]]
 
     # returns tie group that uid belongs to
     def get_tie_group(self, uid):
@@ -116,21 +239,29 @@ class ListPreferenceFunction(PreferenceFunction):
         return self.internal_list[rank]
 
     def get_all_weakly_preferred(self, uid):
-        return self.get_all_preferred(uid=uid) + self.get_tie_group(uid=uid)
+        rank = self.ranks.get(uid)
+        if rank is None:
+            raise Exception('uid not in preference list: %r; internal_list; %r'
+                            % (uid, self.internal_list))
+        return self.acceptable[:self.ends[rank]]
 
-    # added get_acceptable
+    # added get_acceptable, the returned list must not be modified
     def get_acceptable(self):
-        acc = []
-        for v in self.internal_list.values():
-            acc.extend(v)
-        return acc
+        return self.acceptable
+
+    def is_acceptable(self, uid):
+        return uid in self.ranks
 
     def get_rank(self, uid):
-        for rank in self.internal_list:
-            if uid in self.internal_list[rank]:
-                return rank
+        return self.ranks.get(uid)
+
+    # number of agents in the tie groups ranked before rank
+    def get_ranked_higher_than(self, rank):
+        return self.starts[rank]
 
 class Agent():
+    __slots__ = ('uid',)
+
     def __init__(self, uid):
         self.uid = uid
         assert self.uid is not None
@@ -143,6 +274,8 @@ class Agent():
 
 
 class SinglePreferrer(Agent):
+    __slots__ = ('preference_function',)
+
     def __init__(self, preference_function, uid):
         Agent.__init__(self, uid=uid)
         self.preference_function = preference_function
@@ -160,30 +293,31 @@ class SinglePreferrer(Agent):
         return self.preference_function.internal_list[self.get_rank(uid)]
 
     def get_ranked_higher_than(self, rank):
-        count = 0
-        for r in self.preference_function.internal_list.keys():
-            if r < rank:
-                count += len(self.preference_function.internal_list[r])
-        return count
+        return self.preference_function.get_ranked_higher_than(rank)
 
     def get_acceptable(self):
         return self.preference_function.get_acceptable()
 
+    def is_acceptable(self, uid):
+        return self.preference_function.is_acceptable(uid)
+
     def get_rank(self, uid):
         return self.preference_function.get_rank(uid=uid)
 
 class Woman(SinglePreferrer):
+    __slots__ = ()
+
     def __init__(self, preference_function, uid):
         SinglePreferrer.__init__(self,
                                  preference_function=preference_function,
                                  uid=uid)
-        woman_dict[self.uid] = self
 
 
 class NilWoman(Woman):
+    __slots__ = ()
+
     def __init__(self):
         Woman.__init__(self, preference_function=None, uid=NIL_WOMAN_UID)
-        woman_dict[self.uid] = self
 
     def get_all_preferred(self, assignment):
         return []
@@ -193,102 +327,182 @@ class NilWoman(Woman):
 
 
 class Man(SinglePreferrer):
+    __slots__ = ()
+
     def __init__(self, uid, preference_function=None):
         SinglePreferrer.__init__(self, preference_function=preference_function,
                                  uid=uid)
-        man_dict[self.uid] = self
-
-class DIMACSConstraint():
-    def __init__(self, var_list):
-        self.var_list = var_list
-        assert len(self.var_list) > 0
-
-    def render(self):
-        raise Exception('must override in subclass')
-
-
-class DIMACSClause(DIMACSConstraint):
-    def __init__(self, var_list):
-        DIMACSConstraint.__init__(self, var_list=var_list)
-
-    def render(self):
-        return ' '.join([str(var) for var in self.var_list]) + ' 0'
-    
-    def hard_render(self):
-        return '{} '.format(maxw + 1) + ' '.join([str(var) for var in self.var_list]) + ' 0'
-    
-    def soft_max_render(self):
-        return '1 ' + ' '.join([str(var) for var in self.var_list]) + ' 0'
-
-    def soft_egal_render(self, weight):
-        return '{} '.format(str(weight)) + ' '.join([str(var) for var in self.var_list]) + ' 0'
-
 
 class ConstraintsBuffer():
-    def __init__(self, filename):
-        self.filename = filename
-        with open(self.filename, 'w') as f:
-            f.write('')
-        self.buffer_list = []
-        self.soft_buffer_list = []
-        self.buffer_size = 100000000
-
-    def append(self, constraint):
+    # clauses are kept as one flat array of int32 literals, clause i being
+    # literals[offsets[i]:offsets[i + 1]]; soft clauses are kept the same way
+    # with their weights, and are written after the hard clauses. num_vars is
+    # the number of variables of the formula and maxw + 1 the weight of the
+    # hard clauses of a WCNF
+    def __init__(self, maxw=None):
+        self.num_vars = 0
+        self.maxw = maxw
+        self.literals = array('i')
+        self.offsets = array('q', [0])
+        self.soft_literals = array('i')
+        self.soft_offsets = array('q', [0])
+        self.soft_weights = array('q')
+
+    def __len__(self):
+        return len(self.offsets) - 1 + len(self.soft_weights)
+
+    def append(self, var_list):
         # appending hard constraints
-        if len(self.buffer_list) < self.buffer_size:
-            self.buffer_list.append(constraint)
-        else:
-            with open(self.filename, 'a') as f:
-                for item in self.buffer_list:
-                    f.write(item.render() + '\n')
-                f.write(constraint.render() + '\n')
-            self.buffer_list = []
-
-    def soft_append_with_weight(self, constraint, weight):
-        if len(self.buffer_list) < self.buffer_size:
-            self.soft_buffer_list.append((constraint,weight))
-
-    def soft_append(self, constraint):
-        if len(self.buffer_list) < self.buffer_size:
-            self.soft_buffer_list.append(constraint)
-
-
-    def flush(self, opt, variable_registry=None):
-        with open(self.filename, 'a') as f:
+        assert len(var_list) > 0
+        self.literals.extend(var_list)
+        self.offsets.append(len(self.literals))
+
+    def soft_append(self, var_list, weight=1):
+        assert len(var_list) > 0
+        self.soft_literals.extend(var_list)
+        self.soft_offsets.append(len(self.soft_literals))
+        self.soft_weights.append(weight)
+
+    def clauses(self):
+        literals, offsets = self.literals, self.offsets
+        for i in range(len(offsets) - 1):
+            yield literals[offsets[i]:offsets[i + 1]]
+
+    def soft_clauses(self):
+        literals, offsets = self.soft_literals, self.soft_offsets
+        for i, weight in enumerate(self.soft_weights):
+            yield weight, literals[offsets[i]:offsets[i + 1]]
+
+    def write(self, filename, opt):
+        # writes the header and the clauses in one pass, opt = 0 writes a
+        # DIMACS CNF, otherwise a WCNF with hard clauses weighted maxw + 1
+        with open(filename, 'w') as f:
             if opt == 0:
-                for item in self.buffer_list:
-                    f.write(item.render() + '\n')
-                    if variable_registry is not None:
-                        print(' '.join([
-                            ('-' + variable_registry[abs(var)]
-                                if var < 0 else variable_registry[abs(var)])
-                            for var in item.var_list]))
+                f.write('p cnf %s %s\n' % (self.num_vars, len(self)))
+                prefix = ''
             else:
-                for item in self.buffer_list:
-                    f.write(item.hard_render() + '\n')
-                    if variable_registry is not None:
-                        print(' '.join([
-                            ('-' + variable_registry[abs(var)]
-                                if var < 0 else variable_registry[abs(var)])
-                            for var in item.var_list]))
-                if opt == 1:
-                    for item in self.soft_buffer_list:
-                        f.write(item.soft_max_render() + '\n')
-                        if variable_registry is not None:
-                            print(' '.join([
-                                ('-' + variable_registry[abs(var)]
-                                    if var < 0 else variable_registry[abs(var)])
-                                for var in item.var_list]))
-                elif opt == 2:
-                    for item,w in self.soft_buffer_list:
-                        f.write(item.soft_egal_render(w) + '\n')
-                        if variable_registry is not None:
-                            print(' '.join([
-                                ('-' + variable_registry[abs(var)]
-                                    if var < 0 else variable_registry[abs(var)])
-                                for var in item.var_list]))
-        self.buffer_list = []
-        self.soft_buffer_list = []
+                f.write('p wcnf %s %s %s\n' % (self.num_vars, len(self), self.maxw))
+                prefix = '%d ' % (self.maxw + 1)
+            lines = []
+            for clause in self.clauses():
+                lines.append(prefix + ' '.join(map(str, clause)) + ' 0\n')
+                if len(lines) >= 65536:
+                    f.write(''.join(lines))
+                    lines = []
+            if opt != 0:
+                for weight, clause in self.soft_clauses():
+                    lines.append('%d ' % weight + ' '.join(map(str, clause)) + ' 0\n')
+                    if len(lines) >= 65536:
+                        f.write(''.join(lines))
+                        lines = []
+            f.write(''.join(lines))
+
+    def print_clauses(self, opt, variable_registry):
+        soft = (clause for _, clause in self.soft_clauses()) if opt != 0 else ()
+        name = variable_registry.name
+        for clause in list(self.clauses()) + list(soft):
+            print(' '.join([('-' + name(-var) if var < 0 else name(var))
+                            for var in clause]))
+
+    def solve(self, opt, solver_name=PYSAT_SOLVER, stratify=False):
+        # solves the clauses in process with the solvers bundled with PySAT:
+        # a SAT solver for opt = 0 and RC2 (core-guided MaxSAT) otherwise,
+        # which with stratify works on the soft clauses of the largest
+        # weights first and adds the lighter ones level by level. without
+        # soft clauses (e.g. egal=ranks when every list is a single tie) any
+        # model is optimal and the SAT solver is used for every opt.
+        # returns the model as an array of literals, None if unsatisfiable
+        try:
+            from pysat.solvers import Solver
+            from pysat.formula import WCNF
+            from pysat.examples.rc2 import RC2, RC2Stratified
+        except ImportError:
+            raise Exception('the pysat backend requires PySAT (pip install python-sat)')
+        if opt == 0 or not self.soft_weights:
+            with Solver(name=solver_name,
+                        bootstrap_with=[clause.tolist() for clause in self.clauses()]) as solver:
+                if not solver.solve():
+                    return None
+                model = solver.get_model()
+        else:
+            wcnf = WCNF()
+            for clause in self.clauses():
+                wcnf.append(clause.tolist())
+            for weight, clause in self.soft_clauses():
+                wcnf.append(clause.tolist(), weight=weight)
+            maxsat = RC2Stratified if stratify else RC2
+            with maxsat(wcnf, solver=solver_name, adapt=True, exhaust=True,
+                        minz=True) as rc2:
+                model = rc2.compute()
+                if model is None:
+                    return None
+        return array('i', model)
+
+    def minimize_true(self, lits, solver_name=PYSAT_SOLVER, search='linear'):
+        # a model of the hard clauses with the fewest true literals of lits,
+        # None if there is none. a single PySAT solver session is used: an
+        # incremental totalizer over lits gives for every k a literal rhs[k]
+        # that is true if more than k of them are true, and the bounds are
+        # tried by solving under the assumption -rhs[k], so the clauses
+        # learnt for one bound are kept for the next ones. linear search
+        # tightens the bound below each model found, binary search halves
+        # the interval between the best model and the largest refuted bound
+        try:
+            from pysat.solvers import Solver
+            from pysat.card import ITotalizer
+        except ImportError:
+            raise Exception('the pysat backend requires PySAT (pip install python-sat)')
+        lits = list(lits)
+        with Solver(name=solver_name,
+                    bootstrap_with=[clause.tolist() for clause in self.clauses()]) as solver:
+            if not solver.solve():
+                return None
+            best = array('i', solver.get_model())
+            hi = sum(1 for lit in lits if best[abs(lit) - 1] == lit)
+            lo = 0
+            if hi == 0:
+                return best
+            totalizer = ITotalizer(lits=lits, ubound=hi, top_id=self.num_vars)
+            solver.append_formula(totalizer.cnf.clauses)
+            # the optimum is in [lo, hi], hi being the cost of best
+            while lo < hi:
+                k = hi - 1 if search == 'linear' else (lo + hi - 1) // 2
+                if solver.solve(assumptions=[-totalizer.rhs[k]]):
+                    best = array('i', solver.get_model())
+                    hi = sum(1 for lit in lits if best[abs(lit) - 1] == lit)
+                else:
+                    lo = k + 1
+            totalizer.delete()
+        return best[:self.num_vars]
+
+    def enumerate(self, project, solver_name=PYSAT_SOLVER):
+        # yields the models of the hard clauses one by one from a single PySAT
+        # solver session; after each model a clause is added that blocks the
+        # variables of project set to true, so every model yielded differs
+        # from the previous ones on project (at least one of them is true in
+        # every model, as for the matching variables of each man)
+        try:
+            from pysat.solvers import Solver
+        except ImportError:
+            raise Exception('the pysat backend requires PySAT (pip install python-sat)')
+        with Solver(name=solver_name,
+                    bootstrap_with=[clause.tolist() for clause in self.clauses()]) as solver:
+            while solver.solve():
+                model = array('i', solver.get_model())
+                yield model
+                solver.add_clause([-var for var in project if model[var - 1] > 0])
+
+    def enumerate_external(self, project, solver, input_filename,
+                           output_filename):
+        # same as enumerate with an external SAT solver, which is run again
+        # on the whole formula after each blocking clause
+        while True:
+            self.write(input_filename, 0)
+            model = run_external_solver(solver, 0, input_filename, output_filename)
+            if model is None:
+                return
+            yield model
+            self.append([-var for var in project if model[var - 1] > 0])
 
 
 NIL_WOMAN = NilWoman()
@@ -312,151 +526,222 @@ def load_matching_from_file(filename):
     return matching
 
 
+def run_external_solver(solver, opt, input_filename, output_filename):
+    # runs the solver on the formula file and returns its model, see
+    # load_model_from_file
+    if opt == 0:
+        with open(output_filename,'w') as f:
+            subprocess.run(solver + ' ' + input_filename, stdout=f, shell=True)
+    else:
+        with open(output_filename,'w') as f:
+            subprocess.run([solver + ' ' + input_filename +' -m -cpu-lim=2000 -mem-lim=4000'], stdout=f, shell=True)
+    return load_model_from_file(output_filename)
+
+
+def load_model_from_file(filename):
+    # the literals of the 'v' lines of a solver output as an array, None if
+    # the formula is unsatisfiable or no model was printed
+    model = array('i')
+    with open(filename, 'r') as f:
+        for line in f:
+            if "UNSATISFIABLE" in line:
+                return None
+            if line.startswith('v'):
+                model.extend(int(var_str) for var_str in line.split()[1:]
+                             if var_str != '0')
+    return model if len(model) > 0 else None
+
+
 class ProblemInstance():
+    # all the state of an instance and of its encoding is kept in the
+    # instance and in the values returned by encode, so several instances
+    # can be encoded and solved in one process
     def __init__(self, men, women):
         self.men = men
         self.women = women
-        global n
-        n = len(self.men)
+        self.n = len(self.men)
+        self.man_dict = dict((m.uid, m) for m in men)
+        self.woman_dict = dict((w.uid, w) for w in women)
+        self.woman_dict[NIL_WOMAN_UID] = NIL_WOMAN
         self.matching = {}
 
     @classmethod
     def from_file(cls, filename):
-        # does not check that all referred to programs and residents exist
-        # after problem is defined
-        # does check for duplicate residents and programs
-        man_dict = {}
-        woman_dict = {}
-        with open(filename, 'r') as f:
-            men = []
-            women = []
-            for line in f:
-                if (line.startswith('#') or line.startswith(' ')
-                        or line.startswith('\n') or line.startswith('\r')):
-                    continue
-                items = line.replace('\n', '').split(' ')
-                if line.startswith('m'):
-                    if int(items[1]) in man_dict:
-                        raise Exception('duplicate resident: %d'
-                                        % int(items[1]))
-                    # rol = []
-                    # using dict instead of a list
-                    rol = {r:[] for r in range(len(items)-2)}
-                    rank = 0
-
-                    for i in range(2, len(items)):
-                        res = re.findall('\{(.*)\}', items[i])
-                        if len(res) == 0:
-                            rol[rank].append(int(items[i]))
-                        else:
-                            for h in res[0].split(','):
-                                rol[rank].append(int(h))
-                        rank += 1
-
-                    s = Man(uid=int(items[1]),
-                                 preference_function=ListPreferenceFunction(
-                                 internal_list=rol))
-                    men.append(s)
-                elif line.startswith('w'):
-                    if int(items[1]) in woman_dict:
-                        raise Exception(
-                            'duplicate program: %d' % int(items[1]))
-                    #  updated similarly to residents' case
-                    rol = {r:[] for r in range(len(items)-2)}
-                    rank = 0
-                    for i in range(2, len(items)):
-                        res = re.findall('\{(.*)\}', items[i])
-                        if len(res) == 0:
-                            rol[rank].append(int(items[i]))
-                        else:
-                            for h in res[0].split(','):
-                                rol[rank].append(int(h))
-                        rank += 1
-
-                    w = Woman(uid=int(items[1]),
-                                 preference_function=ListPreferenceFunction(
-                                 internal_list=rol))
-                    women.append(w)
-                else:
-                    raise Exception('line not readable: %s' % line)
-            return cls(men=men, women=women)
+        # accepts both the SAT-E format and the text format described in the readme
+        return cls.from_instance(SMTIInstance.from_file(filename))
+
+    @classmethod
+    def from_instance(cls, instance):
+        men = []
+        women = []
+        for uid, groups in enumerate(instance.men.group_lists(), 1):
+            men.append(Man(uid=uid,
+                           preference_function=ListPreferenceFunction(
+                           internal_list=dict(enumerate(groups)))))
+        for uid, groups in enumerate(instance.women.group_lists(), 1):
+            women.append(Woman(uid=uid,
+                               preference_function=ListPreferenceFunction(
+                               internal_list=dict(enumerate(groups)))))
+        return cls(men=men, women=women)
 
     # a matching here is just a dictionary from man_id -> woman_id
+    # the reports are printed to file, the standard output if it is None
+    @staticmethod
+    def print_matching(matching, times, file=None):
+        ProblemInstance.print_times(times, file=file)
+        ProblemInstance.print_pairs(matching, file=file)
+
+    @staticmethod
+    def print_times(times, file=None):
+        print("Modeling time: {}s\n".format(round(times[0],3)), file=file)
+        print("Solving time: {}s\n".format(round(times[1],3)), file=file)
+
     @staticmethod
-    def print_matching(matching, times):
-        print("Modeling time: {}s\n".format(round(times[0],3)))
-        print("Solving time: {}s\n".format(round(times[1],3)))
+    def print_pairs(matching, index=1, file=None):
         if len(matching) == 0:
-            print('No pairs.')
+            print('No pairs.', file=file)
             return
-        print('m 1\n')
+        print('m %d\n' % index, file=file)
         for man_uid in matching.keys():
             if matching[man_uid] == NIL_WOMAN_UID:
-                print('%d %s\n' % (man_uid, NIL_WOMAN_SYMBOL))
+                print('%d %s\n' % (man_uid, NIL_WOMAN_SYMBOL), file=file)
             else:
                 print('%d %d\n' % (man_uid,
-                                        matching[man_uid]))
+                                        matching[man_uid]), file=file)
+
+    def decode_matching(self, model, variable_registry):
+        # the matching {man uid: woman uid} of the xr variables set to true
+        # in model, the men without a partner are matched to NIL_WOMAN_UID.
+        # one pass over the literals, the pair of a variable is read from
+        # the arrays of the registry
+        matching = {}
+        kind, first, second = (variable_registry.kind, variable_registry.first,
+                               variable_registry.second)
+        XR, num_vars = VariableRegistry.XR, len(kind)
+        for var in model:
+            if 0 < var < num_vars and kind[var] == XR:
+                matching[first[var]] = second[var]
+        for m in self.men:
+            if m.uid not in matching:
+                matching[m.uid] = NIL_WOMAN_UID
+        return matching
+
+    def rank_groups(self, res_match):
+        # (agent, groups) for every man and woman, groups[r] being the
+        # matching variables of the agent and its partners of rank r
+        man_dict, woman_dict = self.man_dict, self.woman_dict
+        for m in self.men:
+            yield m, [[res_match[m][woman_dict[w_uid]] for w_uid in group]
+                      for group in m.preference_function.internal_list.values()]
+        for w in self.women:
+            yield w, [[res_match[man_dict[m_uid]][w] for m_uid in group]
+                      for group in w.preference_function.internal_list.values()]
 
-    def solve_sat(self, solver,
-                  problem_name='problem',
-                  opt=0,
-                  verbose=False, run_solver=True,
-                  output_dirname=None,
-                  output_filename=None,
-                  enumerate_all=False):
-        start_time = time.time()
-        variable_registry = {}
-        problem_name_ = os.path.split(problem_name)[-1]
-        constraints_buffer_filename = '%s/constraints/constraints_buffer-%s' % (output_dirname, problem_name_)
-        if output_filename and not run_solver:
-            solver_input_filename = output_filename
-        else:
-            solver_input_filename = '%s/satfiles/%s.sat' % (output_dirname, problem_name_)
-        solver_output_filename = '%s/satoutputfiles/output-%s' % (output_dirname, problem_name_)
-        constraints = ConstraintsBuffer(filename=constraints_buffer_filename)
-        num_constraints = 0
-        # this will keep track of the DIMACS number of each matching variable
-        res_match = {}
-        var_uid_allocator = UIDAllocator(first_uid=1)
-        
-        global maxw
+    def top_weight(self, opt, egal='pairs'):
+        # maxw of the WCNF of the optimization variant opt, None for opt = 0
+        n = self.n
         if opt == 1:
-            maxw = n
+            return n
+        elif opt == 2 and egal == 'ranks':
+            # one unit soft clause per indicator
+            return 1 + sum(max(len(agent.preference_function.internal_list) - 1, 0)
+                           for agent in self.men + self.women)
         elif opt == 2:
-            maxw = (2*n)*(n**2)
-
+            return (2*n)*(n**2)
+        return None
+
+    def encode(self, opt=0, amo='pairwise', egal='pairs', matching_only=False,
+               stability='chain'):
+        # the formula of the instance for the variant opt: returns the clauses,
+        # the matching variables res_match[man][woman] (NIL_WOMAN for single)
+        # and the names of the variables. the matching variables are always
+        # allocated first; with matching_only, the rest of the formula is not
+        # built, which is enough to decode a model of a cached formula
+        variable_registry = VariableRegistry()
+        new_var = variable_registry.new_var
+        XR = VariableRegistry.XR
+        res_match = {}
+        constraints = ConstraintsBuffer(maxw=self.top_weight(opt, egal))
+        woman_dict = self.woman_dict
         for m in self.men:
             assert m not in res_match
             res_match[m] = {}
             # create matching variables res_match
             for w_uid in m.get_acceptable():
                 woman = woman_dict[w_uid]
-                res_match[m][woman] = \
-                    var_uid_allocator.allocate_uid()
-                variable_registry[res_match[m][woman]] = \
-                    'xr_%d,%d' % (m.uid, woman.uid)
+                res_match[m][woman] = new_var(XR, m.uid, woman.uid)
             # add NIL_WOMAN as being single
-            res_match[
-                m][NIL_WOMAN] = var_uid_allocator.allocate_uid()
-            variable_registry[res_match[m][NIL_WOMAN]] = \
-                'xr_%d,%d' % (m.uid, NIL_WOMAN_UID)
-            constraints.append(DIMACSClause([
+            res_match[m][NIL_WOMAN] = new_var(XR, m.uid, NIL_WOMAN_UID)
+            constraints.append([
                 res_match[m][woman_dict[w_uid]]
                 for w_uid in m.get_acceptable()]
-                + [res_match[m][NIL_WOMAN]]))
+                + [res_match[m][NIL_WOMAN]])
+        if not matching_only:
+            self.add_clauses(constraints, res_match, variable_registry, opt,
+                             amo=amo, egal=egal, stability=stability)
+        constraints.num_vars = len(variable_registry)
+        return constraints, res_match, variable_registry
+
+    def add_clauses(self, constraints, res_match, variable_registry, opt,
+                    amo='pairwise', egal='pairs', stability='chain'):
+        # adds the clauses on top of the matching variables res_match
+        man_dict, woman_dict, n = self.man_dict, self.woman_dict, self.n
+
+        def new_var(kind=VariableRegistry.AMO):
+            return variable_registry.new_var(kind)
 
         # no man can be matched to two women
         for m in self.men:
-            for (w1_uid, w2_uid) in combinations(
-                    m.get_acceptable() + [NIL_WOMAN_UID], 2):
-                constraints.append(DIMACSClause(
-                    [-res_match[m][woman_dict[w1_uid]],
-                     -res_match[m][woman_dict[w2_uid]]]))
+            at_most_one(constraints,
+                        [res_match[m][woman_dict[w_uid]]
+                         for w_uid in m.get_acceptable() + [NIL_WOMAN_UID]],
+                        new_var, amo)
         # no woman can be matched to two men
         for w in self.women:
-            for (m1, m2) in combinations(w.get_acceptable(), 2):
-                constraints.append(DIMACSClause(
-                        [-res_match[man_dict[m1]][w], -res_match[man_dict[m2]][w]]))
+            at_most_one(constraints,
+                        [res_match[man_dict[m_uid]][w]
+                         for m_uid in w.get_acceptable()],
+                        new_var, amo)
+
+        # no pair can block the matching
+        if stability == 'order':
+            self.add_order_clauses(constraints, res_match, variable_registry)
+        else:
+            self.add_chain_clauses(constraints, res_match, variable_registry)
+
+        if opt == 1:
+            for man in self.men:
+                constraints.soft_append([-res_match[man][NIL_WOMAN]])
+        
+        elif opt == 2 and egal == 'ranks':
+            # the egalitarian cost of a matching, the sum over the matched
+            # agents of the rank of their partner (counted from 0, as below),
+            # is the number of true indicators a_r of all agents: a_r is
+            # implied by a partner of rank r or worse and implies a_(r-1)
+            for agent, groups in self.rank_groups(res_match):
+                a = [None] + [new_var(VariableRegistry.A) for _ in range(1, len(groups))]
+                for r in range(1, len(groups)):
+                    if r > 1:
+                        constraints.append([-a[r], a[r - 1]])
+                    for x in groups[r]:
+                        constraints.append([-x, a[r]])
+                    constraints.soft_append([-a[r]])
+
+        elif opt == 2:
+            for man in self.men:
+                # mutually acceptable pairs, in the order of the women
+                for w_uid in sorted(man.get_acceptable()):
+                    woman = woman_dict[w_uid]
+                    if woman.is_acceptable(man.uid):
+                        constraints.soft_append([res_match[man][woman]], 2*n-(woman.get_rank(man.uid) + man.get_rank(woman.uid)))
+            for man in self.men:
+                constraints.soft_append([res_match[man][NIL_WOMAN]], 2*n)
+
+
+    def add_chain_clauses(self, constraints, res_match, variable_registry):
+        # stability with the q chain of every woman: q[w][i] is true if w is
+        # married to one of the men of her first i tie groups
+        man_dict, woman_dict = self.man_dict, self.woman_dict
 
         q = {}
         for w in self.women:
@@ -471,27 +756,25 @@ class ProblemInstance():
                 ranked_better = w.get_ranked_higher_than(i - 1)
                 idx = ranked_at + ranked_better
 
-                q[w][i] = var_uid_allocator.allocate_uid()
-                variable_registry[q[w][i]] = \
-                        'q_%d,%d' % (w.uid, i)
+                q[w][i] = variable_registry.new_var(VariableRegistry.Q, w.uid, i)
                 if i == 1:
                     # q[w][1] is true if woman w is not married to any of the men in her most preferred tie group
-                    constraints.append(DIMACSClause(
-                        [res_match[man_dict[m]][w] for m in w.get_tie_group(0)] + [-q[w][i]]))
+                    constraints.append(
+                        [res_match[man_dict[m]][w] for m in w.get_tie_group(0)] + [-q[w][i]])
                     for m in w.get_tie_group(0):
                         # if woman w is married to a man m in her most preferred tie group, it implies that q[w][1][1] is true
-                        constraints.append(DIMACSClause(
-                            [-res_match[man_dict[m]][w], q[w][i]]))
+                        constraints.append(
+                            [-res_match[man_dict[m]][w], q[w][i]])
                 else:
                     # q[w][i] (i > 1) is true if woman w is not married to any of the men in her ith preferred tie group
-                     constraints.append(DIMACSClause(
-                           [res_match[man_dict[m]][w] for m in w.get_tie_group(i - 1)] + [q[w][i - 1], -q[w][i]]))
+                     constraints.append(
+                           [res_match[man_dict[m]][w] for m in w.get_tie_group(i - 1)] + [q[w][i - 1], -q[w][i]])
                      for m in w.get_tie_group(i - 1):
-                          constraints.append(DIMACSClause([-res_match[man_dict[m]][w], -q[w][i], -q[w][i-1]]))
-                     constraints.append(DIMACSClause(
-                           [res_match[man_dict[m]][w] for m in w.get_tie_group(i - 1)] + [-q[w][i - 1], q[w][i]]))
+                          constraints.append([-res_match[man_dict[m]][w], -q[w][i], -q[w][i-1]])
+                     constraints.append(
+                           [res_match[man_dict[m]][w] for m in w.get_tie_group(i - 1)] + [-q[w][i - 1], q[w][i]])
                      for m in w.get_tie_group(i - 1):
-                          constraints.append(DIMACSClause([-res_match[man_dict[m]][w], q[w][i], q[w][i-1]]))
+                          constraints.append([-res_match[man_dict[m]][w], q[w][i], q[w][i-1]])
 
         def append_q_vars(l, q_vars):
             l_copy = list(l)
@@ -510,137 +793,161 @@ class ProblemInstance():
                  # man is either married to one of his weakly preferred partners, or 
                  # woman is married to one of her weakly preferred partners
                  # otherwise, they would be a blocking pair
-                 constraints.append(DIMACSClause(
+                 constraints.append(
                        append_q_vars([res_match[
                           man][woman_dict[uid]]
                             for uid in man.get_all_weakly_preferred(
-                               w_uid)], [(w, man, 1)])))
-        
-        if opt == 1:
-            for man in self.men:
-                constraints.soft_append(DIMACSClause([-res_match[man][NIL_WOMAN]]))
-        
-        elif opt == 2:
-            for man in self.men:
-                for woman in self.women:
-                    if man.uid in woman.get_acceptable() and woman.uid in man.get_acceptable():
-                        constraints.soft_append_with_weight(DIMACSClause([res_match[man][woman]]), 2*n-(woman.get_rank(man.uid) + man.get_rank(woman.uid)))
-            for man in self.men:
-                constraints.soft_append_with_weight(DIMACSClause([res_match[man][NIL_WOMAN]]), 2*n)
+                               w_uid)], [(w, man, 1)]))
+
+    def add_order_clauses(self, constraints, res_match, variable_registry):
+        # stability with an order encoding of the rank of the partner of
+        # every agent: y[agent][r] implies that the agent is married to one
+        # of its partners of rank r or better. (m, w) does not block the
+        # matching if y[m][rank of w] or y[w][rank of m], one binary clause
+        # per pair. only this direction of the definition is needed, the
+        # y literals of a stable matching can always be set to its ranks
+        # men and women share uids, so the literals are kept by side
+        ym, yw = {}, {}
+        for agent, groups in self.rank_groups(res_match):
+            if isinstance(agent, Woman):
+                kind, y = VariableRegistry.YW, yw.setdefault(agent.uid, [])
+            else:
+                kind, y = VariableRegistry.YM, ym.setdefault(agent.uid, [])
+            for r, group in enumerate(groups):
+                y.append(variable_registry.new_var(kind, agent.uid, r))
+                constraints.append([-y[r]] + y[r - 1:r] + group)
+        for man in self.men:
+            for w_uid in man.get_acceptable():
+                constraints.append([ym[man.uid][man.get_rank(w_uid)],
+                                    yw[w_uid][self.woman_dict[w_uid].get_rank(man.uid)]])
 
-        if verbose:
-            constraints.flush(opt,variable_registry=variable_registry)
+    def solve_sat(self, solver,
+                  problem_name='problem',
+                  opt=0,
+                  verbose=False, run_solver=True,
+                  output_dirname=None,
+                  output_filename=None,
+                  enumerate_all=False,
+                  cache=None,
+                  amo='pairwise',
+                  backend='external',
+                  pysat_solver=PYSAT_SOLVER,
+                  egal='pairs',
+                  stratify=False,
+                  maxcard='maxsat',
+                  stability='chain',
+                  report=None):
+        # report is the file the matchings are printed to when enumerate_all
+        # is set, the standard output if it is None
+        start_time = time.time()
+        problem_name_ = os.path.split(problem_name)[-1]
+        if output_filename and not run_solver:
+            solver_input_filename = output_filename
         else:
-            constraints.flush(opt)
-
-        # "lazy" implementation that only works in the one-to-one case
-        # only fill out values of true variables
-        count = 0
-        extra_constraints = []
-        num_constraints = 0
-        with open(constraints.filename, 'r') as f:
-            for line in f:
-                if all(c in string.whitespace for c in line):
-                    continue
-                num_constraints += 1
-        num_constraints += len(extra_constraints)
-        with open(solver_input_filename, 'w') as problem:
-            if opt == 0:
-                problem.write('p cnf %s %s\n' % (
-                    var_uid_allocator.last_uid, num_constraints))
-            else:
-                problem.write('p wcnf %s %s %s\n' % (
-                    var_uid_allocator.last_uid, num_constraints, maxw))
-            with open(constraints.filename, 'r') as f:
-                for line in f:
-                    if all(c in string.whitespace for c in line):
-                        continue
-                    problem.write(line)
-            for constraint in extra_constraints:
-                problem.write(constraint.render() + '\n')
+            solver_input_filename = '%s/satfiles/%s.sat' % (output_dirname, problem_name_)
+        solver_output_filename = '%s/satoutputfiles/output-%s' % (output_dirname, problem_name_)
+        # the pysat backend solves the clauses in memory, without any file
+        # and so does the cardinality search of maxcard for opt=1
+        card_search = opt == 1 and maxcard != 'maxsat'
+        in_process = (backend == 'pysat' or card_search) and run_solver
+        if enumerate_all and opt != 0:
+            raise Exception('only the stable matchings of SMTI (opt=0) can be enumerated')
+        # the formula depends only on the instance and opt, so it can be taken
+        # from the cache (see instance_cache.py); the matching variables are
+        # allocated first either way, which is all the decoding below needs
+        formula_kind = 'cnf' if opt == 0 else 'opt%d.wcnf' % opt
+        if opt == 2 and egal != 'pairs':
+            formula_kind = 'egal-%s.%s' % (egal, formula_kind)
+        if amo != 'pairwise':
+            formula_kind = 'amo-%s.%s' % (amo, formula_kind)
+        if stability != 'chain':
+            formula_kind = 'stability-%s.%s' % (stability, formula_kind)
+        cached_formula = None
+        # enumeration adds blocking clauses to the formula, so it needs the
+        # clauses in memory
+        if (cache is not None and not verbose and run_solver and not in_process
+                and not enumerate_all):
+            cached_formula = cache.find(problem_name, formula_kind, ENCODING_VERSION)
+        constraints, res_match, variable_registry = self.encode(
+            opt, amo=amo, egal=egal, matching_only=cached_formula is not None,
+            stability=stability)
+        if cached_formula is None:
+            if not in_process:
+                constraints.write(solver_input_filename, opt)
+                if cache is not None:
+                    cache.get(problem_name, formula_kind, ENCODING_VERSION,
+                              lambda out: shutil.copyfile(solver_input_filename, out))
+            if verbose:
+                constraints.print_clauses(opt, variable_registry)
+        else:
+            solver_input_filename = cached_formula
         if not run_solver:
             return
         end_time = time.time()
         modeling_time = end_time - start_time
 
         start_time = time.time()
-        
-        if opt == 0:
-            with open(solver_output_filename,'w') as f:
-                subprocess.run(solver + ' ' + solver_input_filename, stdout=f, shell=True)
+
+        if enumerate_all:
+            # every matching is printed as soon as it is found, then blocked
+            xr_vars = [var for m in self.men for var in res_match[m].values()]
+            if in_process:
+                models = constraints.enumerate(xr_vars, pysat_solver)
+            else:
+                models = constraints.enumerate_external(
+                    xr_vars, solver, solver_input_filename,
+                    solver_output_filename)
+            count = 0
+            for model in models:
+                count += 1
+                self.matching = self.decode_matching(model, variable_registry)
+                ProblemInstance.print_pairs(self.matching, count, file=report)
+                (report or sys.stdout).flush()
+            print("Matchings found: %d" % count, file=report)
+            return [modeling_time, time.time() - start_time]
+
+        if in_process and card_search:
+            # Max Cardinality SMTI: as few single men as possible
+            model = constraints.minimize_true(
+                [res_match[m][NIL_WOMAN] for m in self.men], pysat_solver,
+                search=maxcard)
+        elif in_process:
+            model = constraints.solve(opt, pysat_solver, stratify=stratify)
         else:
-            with open(solver_output_filename,'w') as f:
-                subprocess.run([solver + ' ' + solver_input_filename +' -m -cpu-lim=2000 -mem-lim=4000'], stdout=f, shell=True)
-        
+            model = run_external_solver(solver, opt, solver_input_filename,
+                                        solver_output_filename)
+
         end_time = time.time()
         solving_time = end_time - start_time
 
-        if verbose:
-            with open(solver_output_filename, 'r') as f:
-                for line in f:
-                    s = line.split()
-                    if len(s) == 1:
-                        print(s)
-                    else:
-                        for var_str in s:
-                            if var_str != '0':
-                                print('%s: %s' % (
-                                    variable_registry[abs(int(var_str))],
-                                    '1' if int(var_str) > 0 else '0'))
-        matching_found = True
-        with open(solver_output_filename, 'r') as f:
-            lines = f.readlines()
-            for line in lines:
-                if "UNSATISFIABLE" in line:
-                    matching_found = False
-                    break
+        if verbose and model is not None:
+            for var in model:
+                # only the matching variables are registered when the
+                # formula comes from the cache
+                print('%s: %s' % (variable_registry.name(abs(var)),
+                                  '1' if var > 0 else '0'))
+        matching_found = model is not None
         if matching_found:
-            self.matching = {}
-            with open(solver_output_filename, 'r') as f:
-                for line in f:
-                    if line.startswith('v'):
-                        s = line.split()
-                        for var_str in s[1:]:
-                            if var_str != '0':
-                                var_name = variable_registry[
-                                    abs(int(var_str))]
-                                if var_name.startswith('xr'):
-                                    if int(var_str) > 0:
-                                        self.matching[
-                                            int(var_name[
-                                                    3:var_name.find(',')])] \
-                                                = int(var_name[
-                                                    var_name.find(',')
-                                                    + 1:len(var_name)])
-                                    elif var_name.startswith('xc'):
-                                        if int(var_str) > 0:
-                                            self.matching[
-                                                int(var_name.split(
-                                                    ',')[1])] = int(
-                                                        var_name.split(',')[2])
-                        for m in self.men:
-                            if m.uid not in self.matching:
-                                self.matching[
-                                    m.uid] = NIL_WOMAN_UID
+            self.matching = self.decode_matching(model, variable_registry)
 
         assert not matching_found or self.matching
-            
-        if enumerate_all:
-            if not matching_found and count == 0:
-                print("Matchings found: 0")
-                return("Matchings found: 0")
-            if not matching_found:
-                print("Matchings found: %d" % count)
-                return "Matchings found: %d" % count
-            ProblemInstance.print_matching(self.matching, '%s-all%d' % (output_filename, count))
-            count += 1
-            # at least one matching must change
-            constraints.append(DIMACSClause(
-                [-res_match[man_dict[m_uid]][woman_dict[self.matching[m_uid]]] for m_uid in self.matching]))
+        return [modeling_time, solving_time]
+
+
+def solve_file(filename, solver=None, report=None, **options):
+    # solves the instance in filename (only formulates it with
+    # run_solver=False) and prints the report of main to report, the
+    # standard output if it is None; options are those of solve_sat
+    problem = ProblemInstance.from_file(filename)
+    times = problem.solve_sat(solver, problem_name=filename, report=report,
+                              **options)
+    if options.get('run_solver', True):
+        if options.get('enumerate_all'):
+            ProblemInstance.print_times(times, file=report)
         else:
-            keep_searching = False
-            return [modeling_time, solving_time]
-           
+            ProblemInstance.print_matching(problem.matching, times, file=report)
+    return times
+
 
 SUFFIX_TABLE = {
     'kpr': '.kpr_out',
@@ -686,6 +993,42 @@ def main():
         help='enumerate all stable matchings', action="store_true")
     parser.add_argument(
         '-o', '--output', help='output filename')
+    parser.add_argument(
+        '--amo',
+        help='the encoding of the at-most-one constraints on the partners of each agent \
+              (pairwise is quadratic in the length of the lists, the others are linear)',
+        choices=AMO_ENCODINGS, default='pairwise')
+    parser.add_argument(
+        '--backend',
+        help='external runs the solver of SAT_SOLVER_PATH on the formula file, \
+              pysat solves the formula in process with PySAT (RC2 for opt=1 and opt=2)',
+        choices=['external', 'pysat'], default='external')
+    parser.add_argument(
+        '--pysat_solver',
+        help='the SAT solver used by the pysat backend', default=PYSAT_SOLVER)
+    parser.add_argument(
+        '--egal',
+        help='the soft clauses of Egalitarian SMTI (opt=2): pairs weighs every pair with its ranks, \
+              ranks uses one unit soft clause per rank threshold of each agent',
+        choices=EGAL_ENCODINGS, default='pairs')
+    parser.add_argument(
+        '--stratify',
+        help='with the pysat backend, solve the weighted formulas by weight levels (stratified RC2)',
+        action="store_true")
+    parser.add_argument(
+        '--maxcard',
+        help='for Max Cardinality SMTI (opt=1): maxsat solves the WCNF, linear and binary search the \
+              number of single men in process with PySAT, with an incremental cardinality constraint',
+        choices=MAXCARD_SEARCHES, default='maxsat')
+    parser.add_argument(
+        '--stability',
+        help='the stability clauses: chain uses a chain of literals per woman and one clause per pair \
+              over the weakly preferred women of the man, order uses literals "partner of rank r or better" \
+              of every agent and one binary clause per pair',
+        choices=STABILITY_ENCODINGS, default='chain')
+    parser.add_argument(
+        '--cache',
+        help='reuse the formula of the same instance from the instance cache', action="store_true")
     args = parser.parse_args()
     if args.output and args.enumerate_all:
         raise Exception("can't enumerate all matchings to single file. to enumerate all matchings, do not specify output.")
@@ -701,10 +1044,10 @@ def main():
 
     if args.formulate:
         run_solver = False
-    problem = ProblemInstance.from_file(args.problem)
     if args.solver == 'sat':
         solver_path = os.environ.get('SAT_SOLVER_PATH')
-        if solver_path is None and run_solver:
+        if (solver_path is None and run_solver and args.backend == 'external'
+                and not (args.opt == '1' and args.maxcard != 'maxsat')):
             raise Exception(
                 'SAT_SOLVER_PATH must contain the path to a '
                 + 'SAT solver that accepts the DIMACS input format')
@@ -712,15 +1055,20 @@ def main():
         # with open(output_filename,'w') as f:
         #     f.write('Solving {} SMTI...\n'.format(optPrefix[int(args.opt)]))
         # print('Solving...')
-        cputimes = problem.solve_sat(solver=solver_path, verbose=args.verbose,
-                                   run_solver=run_solver,
-                                   problem_name=args.problem,
-                                   opt=int(args.opt),
-                                   output_dirname=args.outdir,
-                                   output_filename=output_filename,
-                                   enumerate_all=args.enumerate_all)
-    if run_solver:
-        ProblemInstance.print_matching(problem.matching, cputimes)
+        solve_file(args.problem, solver=solver_path, verbose=args.verbose,
+                   run_solver=run_solver,
+                   opt=int(args.opt),
+                   output_dirname=args.outdir,
+                   output_filename=output_filename,
+                   enumerate_all=args.enumerate_all,
+                   cache=default_cache() if args.cache else None,
+                   amo=args.amo,
+                   backend=args.backend,
+                   pysat_solver=args.pysat_solver,
+                   egal=args.egal,
+                   stratify=args.stratify,
+                   maxcard=args.maxcard,
+                   stability=args.stability)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,88 @@
+'''
+Encodes, and unless --formulate is given solves, every instance of a
+directory with SAT-E over a pool of worker processes. The instances are
+read, encoded and solved inside the workers (see smti.solve_file), so no
+Python interpreter is started per instance. The formulas are written to
+<outdir>/satfiles and the reports, the output of smti.py, to <outdir>/reports.
+
+e.g. python3 SAT-E/smti_batch.py benchmark-instances-50 -outdir dum --backend pysat -workers 8
+'''
+import argparse
+import multiprocessing
+import os
+import sys
+
+import smti
+from instance_cache import default_cache
+
+
+def prepare_outdir(outdir):
+    # the directories solve_sat writes its intermediate files to
+    for sub in ('satfiles', 'satoutputfiles'):
+        os.makedirs(os.path.join(outdir, sub), exist_ok=True)
+
+
+def solve_job(job):
+    # job = (instance file, report file or None, options of smti.solve_file)
+    filename, report_filename, options = job
+    if report_filename is None:
+        return filename, report_filename, smti.solve_file(filename, **options)
+    with open(report_filename, 'w') as report:
+        return filename, report_filename, smti.solve_file(filename, report=report, **options)
+
+
+def run_batch(jobs, workers=None):
+    # runs the jobs in this process if workers is 1, otherwise over a pool
+    # (of one process per CPU if workers is None); yields
+    # (instance file, report file, times) as the jobs finish
+    if workers == 1:
+        for job in jobs:
+            yield solve_job(job)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        for result in pool.imap_unordered(solve_job, jobs):
+            yield result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('directory', help='directory of instance files (any format accepted by smti.py)')
+    parser.add_argument('-outdir', '--outdir', help='the output directory for formulas and reports', default='dum')
+    parser.add_argument('-opt', choices=['0', '1', '2'], default='0',
+                        help='0 for SMTI, 1 for Max Cardinality SMTI and 2 for Egalitarian SMTI')
+    parser.add_argument('--formulate', action='store_true', help='formulate, but do not solve, the instances')
+    parser.add_argument('--backend', choices=['external', 'pysat'], default='external')
+    parser.add_argument('--pysat_solver', default=smti.PYSAT_SOLVER)
+    parser.add_argument('--amo', choices=smti.AMO_ENCODINGS, default='pairwise')
+    parser.add_argument('--egal', choices=smti.EGAL_ENCODINGS, default='pairs')
+    parser.add_argument('--stratify', action='store_true')
+    parser.add_argument('--maxcard', choices=smti.MAXCARD_SEARCHES, default='maxsat')
+    parser.add_argument('--stability', choices=smti.STABILITY_ENCODINGS, default='chain')
+    parser.add_argument('--cache', action='store_true',
+                        help='reuse the formulas of the same instances from the instance cache')
+    parser.add_argument('-workers', type=int, help='number of processes (default: number of CPUs)')
+    args = parser.parse_args()
+
+    solver_path = os.environ.get('SAT_SOLVER_PATH')
+    if (solver_path is None and not args.formulate and args.backend == 'external'
+            and not (args.opt == '1' and args.maxcard != 'maxsat')):
+        raise Exception('SAT_SOLVER_PATH must contain the path to a '
+                        + 'SAT solver that accepts the DIMACS input format')
+    prepare_outdir(args.outdir)
+    reports = os.path.join(args.outdir, 'reports')
+    if not args.formulate:
+        os.makedirs(reports, exist_ok=True)
+    options = dict(solver=solver_path, run_solver=not args.formulate, opt=int(args.opt),
+                   output_dirname=args.outdir, amo=args.amo, backend=args.backend,
+                   pysat_solver=args.pysat_solver, egal=args.egal, stratify=args.stratify,
+                   maxcard=args.maxcard, stability=args.stability,
+                   cache=default_cache() if args.cache else None)
+    jobs = [(os.path.join(args.directory, f), None if args.formulate else os.path.join(reports, f), options)
+            for f in sorted(os.listdir(args.directory))]
+    for filename, report_filename, times in run_batch(jobs, args.workers):
+        print(report_filename or filename)
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+'''
+Converts instances in the text format (see README) into the binary .smti
+format of smti_instance.py, which is loaded with numpy.memmap instead of
+being parsed.
+
+e.g. python3 convert_instances.py benchmark-instances-50 benchmark-instances-100
+writes benchmark-instances-50-bin/*.smti and benchmark-instances-100-bin/*.smti
+'''
+import os
+import argparse
+
+from smti_instance import SMTIInstance
+
+
+def convert(inputFile, outputFile):
+    SMTIInstance.from_file(inputFile).write_binary(outputFile)
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('inputs', nargs='+', help='instance files or directories of instance files')
+    argparser.add_argument('--outdir', '-outdir', metavar='', help='output directory (default: <input directory>-bin)', type=str)
+    args = argparser.parse_args()
+
+    for path in args.inputs:
+        if os.path.isdir(path):
+            files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith('.txt'))
+            outdir = args.outdir or os.path.normpath(path) + '-bin'
+        else:
+            files = [path]
+            outdir = args.outdir or os.path.dirname(path)
+        if outdir:
+            os.makedirs(outdir, exist_ok=True)
+        for inputFile in files:
+            outputFile = os.path.join(outdir, os.path.splitext(os.path.basename(inputFile))[0] + '.smti')
+            convert(inputFile, outputFile)
+        print('{}: {} instances converted into {}'.format(path, len(files), outdir or '.'))
+
+
+if __name__ == '__main__':
+    main()
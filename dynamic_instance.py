@@ -0,0 +1,244 @@
+'''
+SMTI instances that change between solves: agents join, leave or edit their
+preference lists.
+
+DynamicInstance keeps the preference lists, the ranks and the index of
+mutually acceptable pairs of both sides in dictionaries that are patched by
+every operation, instead of being rebuilt from a file. Every operation bumps
+the version of the instance and records the agents it affected: the agent
+itself and every agent of the other side whose mutual partners or whose
+ranking by the agent changed. Derived encodings use changed_since(version)
+to rebuild only the parts that belong to those agents; IncrementalCNF below
+does so for the SAT formulation of weak stability.
+
+Sides are MEN (0) and WOMEN (1). Agent ids are 1-based and are never reused
+after a removal; snapshot() renumbers them into an SMTIInstance and returns
+the original ids of its agents.
+'''
+from smti_instance import SMTIInstance
+
+MEN = 0
+WOMEN = 1
+
+
+class DynamicInstance:
+    def __init__(self, instance=None):
+        self.prefs = ({}, {})      # side -> {agent: [[ids of a tie group], ...]}
+        self.ranks = ({}, {})      # side -> {agent: {other: rank}}, ranks start at 1
+        self.listed_by = ({}, {})  # side -> {agent: agents of the other side listing it}
+        self.mutual = ({}, {})     # side -> {agent: mutually acceptable agents of the other side}
+        self.next_id = [1, 1]
+        self.version = 0
+        self.log = []              # (version, side, agent) for every affected agent
+        if instance is not None:
+            men, women = instance.men.group_lists(), instance.women.group_lists()
+            for side, lists in ((MEN, men), (WOMEN, women)):
+                for agent in range(1, len(lists) + 1):
+                    self._register(side, agent)
+            for side, lists in ((MEN, men), (WOMEN, women)):
+                for agent, groups in enumerate(lists, 1):
+                    self._set(side, agent, groups)
+            self.version = 0
+            self.log = []
+
+    @classmethod
+    def from_file(cls, filename):
+        return cls(SMTIInstance.from_file(filename))
+
+    def agents(self, side):
+        return sorted(self.prefs[side])
+
+    def rank(self, side, agent, other):
+        ''' rank the agent gives to other, 0 if other is unacceptable '''
+        return self.ranks[side][agent].get(other, 0)
+
+    def mrank(self, m, w):
+        return self.rank(MEN, m, w)
+
+    def wrank(self, w, m):
+        return self.rank(WOMEN, w, m)
+
+    def acceptable(self, m, w):
+        return w in self.mutual[MEN].get(m, ())
+
+    def add_agent(self, side, groups=()):
+        ''' adds an agent with the given tie groups to side and returns its id '''
+        agent = self.next_id[side]
+        self._register(side, agent)
+        self.version += 1
+        self._touch(side, agent)
+        self._set(side, agent, groups)
+        return agent
+
+    def remove_agent(self, side, agent):
+        ''' removes the agent and deletes it from every preference list it appears in '''
+        self._check(side, agent)
+        self.version += 1
+        for other in sorted(self.listed_by[side][agent]):
+            groups = [[x for x in group if x != agent] for group in self.prefs[1 - side][other]]
+            self._set(1 - side, other, [group for group in groups if group])
+        self._set(side, agent, [])
+        self._touch(side, agent)
+        for table in (self.prefs, self.ranks, self.listed_by, self.mutual):
+            del table[side][agent]
+
+    def update_preferences(self, side, agent, groups):
+        ''' replaces the preference list of the agent with the given tie groups '''
+        self._check(side, agent)
+        self.version += 1
+        self._set(side, agent, groups)
+
+    def changed_since(self, version):
+        ''' ids of the men and of the women affected by the operations after version '''
+        changed = (set(), set())
+        for v, side, agent in reversed(self.log):
+            if v <= version:
+                break
+            changed[side].add(agent)
+        return changed
+
+    def snapshot(self):
+        '''
+        returns the current instance as an SMTIInstance, with the original ids
+        of its men and women: men_ids[i] is the id of man i + 1, same for women
+        '''
+        men_ids, women_ids = self.agents(MEN), self.agents(WOMEN)
+        men_index = {agent: i for i, agent in enumerate(men_ids, 1)}
+        women_index = {agent: i for i, agent in enumerate(women_ids, 1)}
+        instance = SMTIInstance.from_groups(
+            [[[women_index[w] for w in group] for group in self.prefs[MEN][m]] for m in men_ids],
+            [[[men_index[m] for m in group] for group in self.prefs[WOMEN][w]] for w in women_ids])
+        return instance, men_ids, women_ids
+
+    def _register(self, side, agent):
+        for table in (self.prefs, self.listed_by, self.mutual):
+            table[side][agent] = [] if table is self.prefs else set()
+        self.ranks[side][agent] = {}
+        self.next_id[side] = max(self.next_id[side], agent + 1)
+
+    def _check(self, side, agent):
+        if agent not in self.prefs[side]:
+            raise Exception('{} {} is not in the instance'.format(('man', 'woman')[side], agent))
+
+    def _touch(self, side, agent):
+        self.log.append((self.version, side, agent))
+
+    def _set(self, side, agent, groups):
+        groups = [list(group) for group in groups if len(group) > 0]
+        ranks = {}
+        for rank, group in enumerate(groups, 1):
+            for other in group:
+                if other not in self.prefs[1 - side]:
+                    raise Exception('{} {} is not in the instance'.format(('man', 'woman')[1 - side], other))
+                if other in ranks:
+                    raise Exception('{} appears twice in the list of {} {}'.format(other, ('man', 'woman')[side], agent))
+                ranks[other] = rank
+        old = self.ranks[side][agent]
+        self.prefs[side][agent] = groups
+        self.ranks[side][agent] = ranks
+        self._touch(side, agent)
+        for other in set(old) | set(ranks):
+            was_mutual = other in self.mutual[side][agent]
+            if other in ranks:
+                self.listed_by[1 - side][other].add(agent)
+            else:
+                self.listed_by[1 - side][other].discard(agent)
+            is_mutual = other in ranks and agent in self.ranks[1 - side][other]
+            if is_mutual:
+                self.mutual[side][agent].add(other)
+                self.mutual[1 - side][other].add(agent)
+            else:
+                self.mutual[side][agent].discard(other)
+                self.mutual[1 - side][other].discard(agent)
+            # the clauses of other refer to the rank it is given by agent and to their pair
+            if old.get(other) != ranks.get(other) or is_mutual != was_mutual:
+                self._touch(1 - side, other)
+
+
+class IncrementalCNF:
+    '''
+    CNF encoding of the weakly stable matchings of a DynamicInstance, kept
+    as one block of clauses per agent. refresh() rebuilds the blocks of the
+    agents changed since the last refresh only. Variables are allocated per
+    pair and per (woman, rank) and never renumbered, so unchanged blocks stay
+    valid; variables of removed pairs are simply left unused.
+
+    x(m, w): m and w are matched
+    y(w, r): w is matched to a man she ranks r or better
+    '''
+    def __init__(self, instance):
+        self.instance = instance
+        self.variables = {}
+        self.blocks = ({}, {})
+        self.version = None
+
+    def var(self, *key):
+        if key not in self.variables:
+            self.variables[key] = len(self.variables) + 1
+        return self.variables[key]
+
+    def refresh(self):
+        ''' rebuilds the blocks of the changed agents, returns how many were rebuilt '''
+        if self.version is None:
+            changed = tuple(set(self.instance.prefs[side]) for side in (MEN, WOMEN))
+        else:
+            changed = self.instance.changed_since(self.version)
+        for side, build in ((MEN, self.man_clauses), (WOMEN, self.woman_clauses)):
+            for agent in changed[side]:
+                if agent in self.instance.prefs[side]:
+                    self.blocks[side][agent] = build(agent)
+                else:
+                    self.blocks[side].pop(agent, None)
+        self.version = self.instance.version
+        return len(changed[MEN]) + len(changed[WOMEN])
+
+    def man_clauses(self, m):
+        inst = self.instance
+        partners = sorted(inst.mutual[MEN][m], key=lambda w: inst.mrank(m, w))
+        ranks = [inst.mrank(m, w) for w in partners]
+        x = [self.var('x', m, w) for w in partners]
+        # at most one partner
+        clauses = [[-a, -b] for i, a in enumerate(x) for b in x[i + 1:]]
+        # stability: m has a partner he likes as much as w, or w has one she likes as much as m
+        end = 0
+        for i, w in enumerate(partners):
+            while end < len(partners) and ranks[end] <= ranks[i]:
+                end += 1
+            clauses.append(x[:end] + [self.var('y', w, inst.wrank(w, m))])
+        return clauses
+
+    def woman_clauses(self, w):
+        inst = self.instance
+        partners = sorted(inst.mutual[WOMEN][w], key=lambda m: inst.wrank(w, m))
+        x = [self.var('x', m, w) for m in partners]
+        clauses = [[-a, -b] for i, a in enumerate(x) for b in x[i + 1:]]
+        at_rank = {}
+        for m, lit in zip(partners, x):
+            at_rank.setdefault(inst.wrank(w, m), []).append(lit)
+        # y(w, r) <-> y(w, r - 1) or w is matched to a man of rank r
+        for rank in range(1, len(inst.prefs[WOMEN][w]) + 1):
+            y = self.var('y', w, rank)
+            lits = ([self.var('y', w, rank - 1)] if rank > 1 else []) + at_rank.get(rank, [])
+            clauses.append([-y] + lits)
+            clauses.extend([[y, -lit] for lit in lits])
+        return clauses
+
+    def clauses(self):
+        if self.version != self.instance.version:
+            self.refresh()
+        for side in (MEN, WOMEN):
+            for agent in sorted(self.blocks[side]):
+                for clause in self.blocks[side][agent]:
+                    yield clause
+
+    def write(self, filename):
+        clauses = list(self.clauses())
+        with open(filename, 'w') as f:
+            f.write('p cnf {} {}\n'.format(len(self.variables), len(clauses)))
+            f.write(''.join(' '.join(map(str, clause)) + ' 0\n' for clause in clauses))
+
+    def matching(self, model):
+        ''' {man: woman} of the pairs set to true in model (a list of literals) '''
+        true = set(lit for lit in model if lit > 0)
+        return {key[1]: key[2] for key, var in self.variables.items()
+                if key[0] == 'x' and var in true and self.instance.acceptable(key[1], key[2])}
@@ -0,0 +1,133 @@
+'''
+On-disk cache of the solver inputs derived from an instance: ASP facts,
+SAT-E input, DIMACS/WCNF formulas, LP/MPS models.
+
+An entry is addressed by the SHA-256 of the instance file plus the kind of
+the derived file and the version of the encoding that produced it, so the
+same instance is converted or encoded once no matter how many solvers,
+variants or sweeps use it. Bump the version passed by a producer whenever
+its output changes. The cache is bounded in size: every hit refreshes the
+modification time of the entry and the least recently used entries are
+removed when the total size exceeds the limit. The entries are listed once,
+when the cache is first used, and then kept in an LRU index in memory with
+their total size; entries added by other processes afterwards are only seen
+by caches opened later.
+
+The location and size of the default cache are taken from the environment
+variables SMTI_CACHE_DIR (default .smti-cache) and SMTI_CACHE_SIZE (in MB,
+default 2048).
+'''
+import os
+import hashlib
+from collections import OrderedDict
+
+DEFAULT_CACHE_DIR = '.smti-cache'
+DEFAULT_CACHE_SIZE = 2048  # in MB
+TMP_MARKER = '.tmp'  # entries being built are named <entry>.tmp<pid>.<kind> until they are complete
+
+
+class InstanceCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_SIZE * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._hashes = {}
+        self._entries = None  # path -> size, least recently used first
+        self._total = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def entries(self):
+        '''
+        LRU index of the entries, built by listing the directory on first use.
+        The files that are still being built (by this or another process) are
+        left out, so they are neither counted nor evicted.
+        '''
+        if self._entries is None:
+            entries = []
+            for root, dirs, files in os.walk(self.directory):
+                for f in files:
+                    if TMP_MARKER in f:
+                        continue
+                    path = os.path.join(root, f)
+                    try:
+                        st = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, path, st.st_size))
+            entries.sort()
+            self._entries = OrderedDict((path, size) for mtime, path, size in entries)
+            self._total = sum(self._entries.values())
+        return self._entries
+
+    def instance_hash(self, filename):
+        st = os.stat(filename)
+        key = (os.path.abspath(filename), st.st_size, st.st_mtime_ns)
+        if key not in self._hashes:
+            h = hashlib.sha256()
+            with open(filename, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    h.update(block)
+            self._hashes[key] = h.hexdigest()
+        return self._hashes[key]
+
+    def path(self, filename, kind, version):
+        ''' path of the entry of kind (e.g. 'asp.lp') derived from instance filename '''
+        digest = self.instance_hash(filename)
+        return os.path.join(self.directory, digest[:2], '{}-v{}.{}'.format(digest, version, kind))
+
+    def find(self, filename, kind, version):
+        ''' returns the path of the cached entry, None if it is missing '''
+        path = self.path(filename, kind, version)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)
+        entries = self.entries()
+        if path not in entries:  # added by another process
+            entries[path] = os.path.getsize(path)
+            self._total += entries[path]
+        entries.move_to_end(path)
+        return path
+
+    def get(self, filename, kind, version, build):
+        '''
+        returns the path of the cached entry, calling build(path) to create
+        it when it is missing
+        '''
+        found = self.find(filename, kind, version)
+        if found is not None:
+            return found
+        path = self.path(filename, kind, version)
+        entries = self.entries()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # build next to the final path and rename, so that concurrent runs never see partial files
+        root, ext = os.path.splitext(path)
+        tmp = '{}{}{}{}'.format(root, TMP_MARKER, os.getpid(), ext)
+        try:
+            build(tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        size = os.path.getsize(path)
+        self._total += size - entries.pop(path, 0)
+        entries[path] = size
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        ''' removes least recently used entries until the cache fits in max_bytes '''
+        entries = self.entries()
+        for path in list(entries):
+            if self._total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._total -= entries.pop(path)
+
+
+def default_cache():
+    return InstanceCache(os.environ.get('SMTI_CACHE_DIR', DEFAULT_CACHE_DIR),
+                         int(os.environ.get('SMTI_CACHE_SIZE', DEFAULT_CACHE_SIZE)) * 2**20)
@@ -14,9 +14,15 @@ Original file is located at
 #Edited on 9/9/2022;
 #Allowing samples and fixing bug for ties on women's pref lists
 
+#Edited on 17/10/2026;
+#Vectorized with NumPy, the instances follow the same distribution
+
 import numpy as np
 import argparse
-import random
+import multiprocessing
+import os
+
+from smti_instance import SMTIInstance, PreferenceTable, FORMATS, converted_path
 
 def CreateFile(w_pref, m_pref, fname):
   f = open(fname, 'w')
@@ -56,116 +62,130 @@ def CreateFile(w_pref, m_pref, fname):
   f.close()
 
 
-def GenerateRandomMatching(n1, n2, p1, p2):
-  #Step 1 : Random Matching of size n
-  m_pref = {}
-  w_pref = {}
-  for i in range(0, n2):
-    w_pref[i] = np.random.permutation(n1).tolist()  
-  for i in range(0, n1):
-    m_pref[i] = np.random.permutation(n2).tolist()  
-  #----------------------------------
+#Step 1 & 2 : Random preference orders with incompleteness
+def GenerateRandomMatching(n1, n2, p1, rng):
+  #acceptability matrix: each pair is removed from both lists with probability p1
+  accept = rng.random((n1, n2)) > p1
 
-  #Step 2 : Adding Incompleteness
-  for i in range(0, n1):
-    for j in range(0, n2):
-      if p1 >= random.random():
-        m_pref[i].remove(j)
-        w_pref[j].remove(i)
+  #Step 3 : Everyone has to have at least someone in his/her preference list.
+  #Only the mask is drawn again, the orders below are independent of it
+  while not CheckValid(accept):
+    accept = rng.random((n1, n2)) > p1
 
-  return m_pref, w_pref
+  m_order = RandomOrders(n1, n2, rng)
+  w_order = RandomOrders(n2, n1, rng)
+  return accept, m_order, w_order
 #--------------------------------------------
 
 
-#Step 3 : Check if the initial state is valid
-def CheckValid(m_pref, w_pref):
-  for i in range(0, len(m_pref)):
-    if len(m_pref[i]) == 0:
-      return False
+def RandomOrders(n, other, rng):
+  #one random permutation of 0..other-1 per row, by sorting random keys
+  return rng.random((n, other)).argsort(axis=1).astype(np.int32)
 
-  for i in range(0, len(w_pref)):
-    if len(w_pref[i]) == 0:
-      return False
 
-  return True
+#Step 3 : Check if the initial state is valid
+def CheckValid(accept):
+  return bool(accept.any(axis=1).all() and accept.any(axis=0).all())
 #-------------------------------------------
 
 
 
 #Step 4 : Adding Ties
-def AddTies(p2, m_pref, w_pref):
-  #Changing the format in order to store ties
-  m_pref_list2 = []
-  for i in range(len(m_pref)):
-    m_pref_list=[]
-    for j in range(len(m_pref[i])):
-      temp = []
-      temp.append(m_pref[i][j])
-      m_pref_list.append(temp)
-      temp=[]
-    m_pref_list2.append(m_pref_list)
-
-  w_pref_list2 = []
-  for i in range(len(w_pref)):
-    w_pref_list=[]
-    for j in range(len(w_pref[i])):
-      temp = []
-      temp.append(w_pref[i][j])
-      w_pref_list.append(temp)
-      temp=[]
-    w_pref_list2.append(w_pref_list)
-  #------------------------------------------
-  
-  #Step 4 : Adding Ties for each man and woman
-  for i in range(0, len(m_pref_list2)):
-    j=1
-    while j < len(m_pref_list2[i]):
-      if random.random() <= p2 and j < len(m_pref_list2[i]):
-        m_pref_list2[i][j-1].append(m_pref_list2[i][j][0])
-        del m_pref_list2[i][j]
-        j -= 1
-      j += 1
-      
-  for i in range(0, len(w_pref_list2)):
-    j=1
-    while j < len(w_pref_list2[i]):
-      if random.random() <= p2 and j < len(w_pref_list2[i]):
-        w_pref_list2[i][j-1].append(w_pref_list2[i][j][0])
-        del w_pref_list2[i][j]
-        j -= 1
-      j += 1
-  #---------------------------------------------
-
-  return m_pref_list2, w_pref_list2
-
-
-
-def GentProsser(n1, n2, p1, p2):
-  m_pref, w_pref = GenerateRandomMatching(n1, n2, p1, p2) #Step 1 & 2 is done with this function
-
-  #Step 3 : Everyone has to have at least someone in his/her preference list
-  while CheckValid(m_pref, w_pref) == False:
-     m_pref, w_pref = GenerateRandomMatching(n1, n2, p1, p2)  
-    
-
-  m_pref, w_pref = AddTies(p2, m_pref, w_pref) #Step 4 is done with this function
+def AddTies(p2, accept, order, rng):
+  #keeps the acceptable entries of every permutation, in CSR form (see smti_instance.py)
+  keep = np.take_along_axis(accept, order, axis=1)
+  prefs = order[keep] + 1
+  ptr = np.zeros(len(order) + 1, dtype=np.int64)
+  np.cumsum(keep.sum(axis=1), out=ptr[1:])
+
+  #every entry but the first of a list joins the tie group of the entry before it with probability p2
+  starts = rng.random(len(prefs)) > p2
+  starts[ptr[:-1]] = True
+  gbound = np.append(np.flatnonzero(starts), len(prefs))
+  gptr = np.zeros(len(order) + 1, dtype=np.int64)
+  gptr[1:] = np.cumsum(starts)[ptr[1:] - 1]
+  return PreferenceTable(len(order), accept.shape[1], ptr, prefs, gptr, gbound)
+
+
+
+def GentProsserInstance(n1, n2, p1, p2, rng=None):
+  if rng is None:
+    rng = np.random.default_rng()
+  accept, m_order, w_order = GenerateRandomMatching(n1, n2, p1, rng) #Step 1, 2 & 3 are done with this function
+  men = AddTies(p2, accept, m_order, rng) #Step 4 is done with this function
+  women = AddTies(p2, accept.T, w_order, rng)
+  return SMTIInstance(men, women)
+
+
+def WriteInstance(instance, fname, formats=('txt',)):
+  #writes the instance in every format at once: fname for the text format,
+  #the directories next to it for the others (see converted_path in smti_instance.py).
+  #the text file is written first, the runners only use conversions that are not older than it
+  for fmt in sorted(formats, key=lambda fmt: fmt != 'txt'):
+    path = fname if fmt == 'txt' else converted_path(fname, fmt)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    instance.write(path, fmt)
+
+
+def GentProsser(n1, n2, p1, p2, rng=None):
+  #preference lists as lists of tie groups of 0-based ids, as taken by CreateFile
+  instance = GentProsserInstance(n1, n2, p1, p2, rng)
+  m_pref = [[[x - 1 for x in group] for group in groups] for groups in instance.men.group_lists()]
+  w_pref = [[[x - 1 for x in group] for group in groups] for groups in instance.women.group_lists()]
   return m_pref, w_pref
 
 
+#Benchmark suites: the whole p1 x p2 x sample grid, as in benchmark-instances-50 and -100
+SUITE_P1 = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8]
+SUITE_P2 = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
+SUITE_SAMPLES = 10
+
+def SuiteFileName(directory, n, p1, p2, i):
+  return '{}/input-smti-s-{}--i-{}pc-t-{}pc--{}.txt'.format(directory, n, p1, p2, i)
+
+
+def InstanceRng(n1, n2, p1, p2, i, seed=0):
+  #the random state of an instance depends only on its parameters and the seed of the suite,
+  #so any instance can be regenerated on its own, in any process and in any order
+  return np.random.default_rng([seed, n1, n2, int(round(p1 * 1000)), int(round(p2 * 1000)), i])
+
+
+def GenerateSuiteInstance(job):
+  directory, n1, n2, p1, p2, i, seed, formats = job
+  fname = SuiteFileName(directory, n1, p1, p2, i)
+  WriteInstance(GentProsserInstance(n1, n2, p1, p2, InstanceRng(n1, n2, p1, p2, i, seed)), fname, formats)
+  return fname
+
+
+def GenerateSuite(directory, n1, n2, p1s=SUITE_P1, p2s=SUITE_P2, samples=SUITE_SAMPLES, seed=0, workers=None, formats=('txt',)):
+  #generates every instance of the grid over a process pool, returns the file names
+  jobs = [(directory, n1, n2, p1, p2, i, seed, formats) for p1 in p1s for p2 in p2s for i in range(1, samples + 1)]
+  with multiprocessing.Pool(workers) as pool:
+    return list(pool.imap(GenerateSuiteInstance, jobs))
+
+
 if __name__=='__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("-nmen", type=int,
                         help="number of men", required=True)
     parser.add_argument("-nwomen", type=int,
                         help="number of women")
-    parser.add_argument("-p1", type=float,
-                        help="probability of incompleteness in pref. lists", required=True)
-    parser.add_argument("-p2", type=float,
-                        help="probability of ties in pref. lists", required=True)
+    parser.add_argument("-p1", type=float, nargs='+',
+                        help="probability of incompleteness in pref. lists (several values with -suite)")
+    parser.add_argument("-p2", type=float, nargs='+',
+                        help="probability of ties in pref. lists (several values with -suite)")
     parser.add_argument("-n", type=int,
-                        help="number of samples", required=True)
+                        help="number of samples (for each p1 and p2 with -suite)")
     parser.add_argument("-dir", type=str,
                         help="directory for the generated instance files", required=True)
+    parser.add_argument("-suite", action="store_true",
+                        help="generate the whole p1 x p2 x sample grid, by default the one of the benchmark suites")
+    parser.add_argument("-seed", type=int,
+                        help="seed of the instances; with the same seed every instance is generated identically")
+    parser.add_argument("-workers", type=int,
+                        help="number of processes for -suite (default: number of CPUs)")
+    parser.add_argument("-formats", nargs='+', choices=list(FORMATS), default=['txt'],
+                        help="formats to write: txt into -dir, lp (ASP), sat (SAT-E) and smti (binary) into -dir-lp, -dir-sat and -dir-bin")
     args = parser.parse_args()
 
     if not args.nwomen:
@@ -173,7 +193,15 @@ if __name__=='__main__':
     else:
         nwomen = args.nwomen
 
-    for i in range(1,args.n+1):
-      fname = '{}/input-smti-s-{}-i-{}-t-{}--{}.txt'.format(args.dir, args.nmen, args.p1, args.p2, i)
-      m_pref, w_pref = GentProsser(args.nmen, nwomen, args.p1, args.p2)
-      CreateFile(w_pref, m_pref, fname)
+    if args.suite:
+        GenerateSuite(args.dir, args.nmen, nwomen,
+                      args.p1 or SUITE_P1, args.p2 or SUITE_P2, args.n or SUITE_SAMPLES,
+                      args.seed or 0, args.workers, args.formats)
+    else:
+      if args.p1 is None or args.p2 is None or args.n is None or len(args.p1) != 1 or len(args.p2) != 1:
+        parser.error("-p1, -p2 and -n are required, with a single value of p1 and p2 unless -suite is given")
+      p1, p2 = args.p1[0], args.p2[0]
+      for i in range(1,args.n+1):
+        fname = '{}/input-smti-s-{}-i-{}-t-{}--{}.txt'.format(args.dir, args.nmen, p1, p2, i)
+        rng = None if args.seed is None else InstanceRng(args.nmen, nwomen, p1, p2, i, args.seed)
+        WriteInstance(GentProsserInstance(args.nmen, nwomen, p1, p2, rng), fname, args.formats)
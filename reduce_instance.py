@@ -0,0 +1,128 @@
+'''
+Sound reductions of SMTI instances, applied before any solver.
+
+The following pairs are in no weakly stable matching and cannot block one,
+so removing them keeps exactly the same set of weakly stable matchings:
+  - pairs that are acceptable to one side only,
+  - if woman w ranks man m strictly first and w is in the first tie group of m,
+    m is matched to a woman of that group in every weakly stable matching
+    (otherwise m and w block it), so the women after that group can be removed
+    from his list; the same holds with men and women swapped
+    (Delorme, Garcia, Gondzio, Kalcsics, Manlove & Pettersson, 2019).
+Both rules are applied until none applies, as every removal may create new
+strict first choices.
+
+By default the ranks of the remaining pairs are kept (tie groups emptied by
+the reductions stay as empty groups) and so are the agents, so that
+egalitarian and sex-equal costs are unchanged (SAT-E weighs its soft clauses
+by the number of men). With keep_ranks=False, which is enough for SMTI and
+Max Cardinality SMTI, the lists are compacted and the agents left without
+partners, who are single in every stable matching, are removed.
+
+e.g. python3 reduce_instance.py input.txt -o reduced.txt
+'''
+import argparse
+from collections import deque
+
+from smti_instance import SMTIInstance
+
+# bump when the reductions change, see instance_cache.py
+REDUCTION_VERSION = 2
+
+
+class Reduction:
+    '''
+    a reduced instance: men_ids[i] is the id in the original instance of man
+    i + 1 of the reduced instance, same for women_ids
+    '''
+    def __init__(self, instance, men_ids, women_ids, removed_entries):
+        self.instance = instance
+        self.men_ids = men_ids
+        self.women_ids = women_ids
+        self.removed_entries = removed_entries
+
+    def restore(self, matching):
+        ''' maps a matching {man: woman} of the reduced instance to the original ids '''
+        return {self.men_ids[m - 1]: self.women_ids[w - 1] for m, w in matching.items()}
+
+
+def reduce_instance(instance, keep_ranks=True):
+    pairs = instance.pairs
+    mutual = [set() for _ in range(instance.n_men + 1)]
+    for m, w in zip(pairs.man.tolist(), pairs.woman.tolist()):
+        mutual[m].add(w)
+    # lists[side][agent - 1][rank - 1] is the tie group of the agent at that rank
+    lists = ([[[w for w in group if w in mutual[m]] for group in groups]
+              for m, groups in enumerate(instance.men.group_lists(), 1)],
+             [[[m for m in group if w in mutual[m]] for group in groups]
+              for w, groups in enumerate(instance.women.group_lists(), 1)])
+    removed = len(instance.men.prefs) + len(instance.women.prefs) - 2 * len(pairs)
+
+    def first(side, agent):
+        ''' rank - 1 of the first non empty tie group of the agent, None if there is none '''
+        return next((r for r, group in enumerate(lists[side][agent - 1]) if group), None)
+
+    queue = deque([(0, m) for m in range(1, instance.n_men + 1)] + [(1, w) for w in range(1, instance.n_women + 1)])
+    while queue:
+        side, agent = queue.popleft()
+        top = first(side, agent)
+        if top is None or len(lists[side][agent - 1][top]) != 1:
+            continue
+        # agent strictly prefers partner to everyone else
+        partner = lists[side][agent - 1][top][0]
+        partner_list = lists[1 - side][partner - 1]
+        partner_top = first(1 - side, partner)
+        if agent not in partner_list[partner_top]:
+            continue
+        # partner is matched within its first group: cut its list after that group
+        for r in range(partner_top + 1, len(partner_list)):
+            for other in partner_list[r]:
+                other_list = lists[side][other - 1]
+                for group in other_list:
+                    if partner in group:
+                        group.remove(partner)
+                        break
+                # the first group of other may have changed: other may now have a strict
+                # first choice, and so may the agents of its first group that rank other first
+                queue.append((side, other))
+                other_top = first(side, other)
+                if other_top is not None:
+                    queue.extend((1 - side, x) for x in other_list[other_top])
+                removed += 2
+            partner_list[r] = []
+
+    for side_lists in lists:
+        for groups in side_lists:
+            if keep_ranks:
+                while groups and not groups[-1]:
+                    groups.pop()
+            else:
+                groups[:] = [group for group in groups if group]
+    men_ids = [m for m in range(1, instance.n_men + 1) if keep_ranks or lists[0][m - 1]]
+    women_ids = [w for w in range(1, instance.n_women + 1) if keep_ranks or lists[1][w - 1]]
+    men_index = {m: i for i, m in enumerate(men_ids, 1)}
+    women_index = {w: i for i, w in enumerate(women_ids, 1)}
+    reduced = SMTIInstance.from_groups(
+        [[[women_index[w] for w in group] for group in lists[0][m - 1]] for m in men_ids],
+        [[[men_index[m] for m in group] for group in lists[1][w - 1]] for w in women_ids])
+    return Reduction(reduced, men_ids, women_ids, removed)
+
+
+def main():
+    argparser = argparse.ArgumentParser()
+    argparser.add_argument('input', help='instance file (text, SAT-E or binary format)')
+    argparser.add_argument('--output', '-o', metavar='', help='output file for the reduced instance (text format)', type=str, required=True)
+    argparser.add_argument('--compact', action='store_true', help='renumber the ranks (enough for SMTI and Max Cardinality SMTI)')
+    args = argparser.parse_args()
+
+    instance = SMTIInstance.from_file(args.input)
+    reduction = reduce_instance(instance, keep_ranks=not args.compact)
+    reduction.instance.write_text(args.output)
+    print('men: {} -> {}, women: {} -> {}, list entries: {} -> {}'.format(
+        instance.n_men, reduction.instance.n_men, instance.n_women, reduction.instance.n_women,
+        len(instance.men.prefs) + len(instance.women.prefs),
+        len(reduction.instance.men.prefs) + len(reduction.instance.women.prefs)))
+
+
+if __name__ == '__main__':
+    main()
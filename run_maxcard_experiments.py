@@ -1,86 +1,50 @@
 import os
-import re
 import subprocess
 import multiprocessing
 import json
 import argparse
 
+from smti_instance import SMTIInstance, ASP_FORMAT_VERSION, SAT_E_FORMAT_VERSION, fresh_converted_path
+from instance_cache import default_cache
+from reduce_instance import reduce_instance, REDUCTION_VERSION
+
 TIMEOUT_VALUE = 2000 # in seconds
+CACHE = None # converted inputs and encodings, shared by all runs, opened by cache() on first use
 
 solvers = ['GUROBI', 'LTIU', 'CLINGO', 'SAT', 'OR-CP-GP', 'OR-CP-KM', 'OR-MIP-KM', 'GA']
 
 
+
+def cache():
+    global CACHE
+    if CACHE is None:
+        CACHE = default_cache()
+    return CACHE
+
 def ASP_inputConverter(inputFile):
-    # takes the inputFile(as path) and converts it into the input format for ASP solver.
-    # the converted input will be written in a file called input_ASP_Version.lp
-    # So, for each input file we will change this file only for ASP instead of creating new files for each input.
-
-    f = open(inputFile)
-    output_str = ''
-    lines = f.read().split('\n')
-    f.close()
-    m_size = int(lines[1])
-    w_size = int(lines[2])
-
-    output_str += 'man(1..{}).\n'.format(m_size)
-    output_str += 'woman(1..{}).\n'.format(w_size)
-
-    for line in lines[3:m_size + 3]:
-        m = line.split(' ')[0]
-        cnt = 1
-        for group in line.split(' (')[1:]:
-            gr = group.replace(')', '')
-            if gr != '':
-                for el in gr.split(' '):
-                    if el != '':
-                        output_str += 'mrank({},{},{}).\n'.format(m, el, cnt)
-                cnt += 1
-
-    for line in lines[m_size + 3:m_size + w_size + 3]:
-        w = line.split(' ')[0]
-        cnt = 1
-        for group in line.split(' (')[1:]:
-            gr = group.replace(')', '')
-            if gr != '':
-                for el in gr.split(' '):
-                    if el != '':
-                        output_str += 'wrank({},{},{}).\n'.format(w, el, cnt)
-                cnt += 1
-
-    f = open('input_ASP.lp', 'w')
-    f.write(output_str)
-    f.close()
+    # takes the inputFile(as path) and returns the path of its conversion into the input format for ASP solver.
+    # the converted input is kept in the instance cache (see instance_cache.py),
+    # so each input file is converted only once for all solvers and runs.
+    # instances generated with instance_generator.py -formats lp are used as they are,
+    # unless the instance is newer than its conversion (see fresh_converted_path).
+    converted = fresh_converted_path(inputFile, 'lp')
+    if converted is not None:
+        return converted
+    return cache().get(inputFile, 'lp', ASP_FORMAT_VERSION, lambda out: SMTIInstance.from_file(inputFile).write_asp(out))
 
 def SAT_inputConverter(inputFile, size):
-    output_str=''
-    with open(inputFile) as f:
-        lines = f.readlines()[3:]
-        for line in lines[:size]:
-           output_str += 'm ' + line.split()[0] + ' '
-           ff = re.findall('\(([\d ]+)\)', line)
-           prefs = []
-           for f in ff:
-               if ' ' in f:
-                   prefs.append('{' + f.replace(' ',',') + '}')
-               else:
-                   prefs.append(f)
-           output_str += ' '.join(prefs)
-           output_str += '\n'
-        for line in lines[size:]:
-           output_str += 'w ' + line.split()[0] + ' '
-           ff = re.findall('\(([\d ]+)\)', line)
-           prefs = []
-           for f in ff:
-               if ' ' in f:
-                   prefs.append('{' + f.replace(' ',',') + '}')
-               else:
-                   prefs.append(f)
-           output_str += ' '.join(prefs)
-           output_str += '\n'
-    
-    f = open('input_SAT.txt', 'w')
-    f.write(output_str)
-    f.close()
+    converted = fresh_converted_path(inputFile, 'sat')
+    if converted is not None:
+        return converted
+    return cache().get(inputFile, 'sat.txt', SAT_E_FORMAT_VERSION, lambda out: SMTIInstance.from_file(inputFile).write_sat_e(out))
+
+def reducedInput(inputFile):
+    # takes the inputFile(as path) and returns the path of the instance without the pairs and agents that cannot
+    # be in any stable matching (see reduce_instance.py). the reduced instance is kept in the instance cache as well.
+    # the agents keep their ids (keep_ranks=True), so the matchings and singles reported by the solvers are
+    # those of the original instance, with the same number of agents.
+    return cache().get(inputFile, 'reduced.txt', REDUCTION_VERSION,
+                     lambda out: reduce_instance(SMTIInstance.from_file(inputFile), keep_ranks=True).instance.write_text(out))
 
 
 def timeout(func, command, timeoutValue):
@@ -104,25 +68,26 @@ def run_SMTI_Solver(command, return_dict):
     return_dict[0] = subPro
 
 
-def solve(root, inputFile, outputFilesPath, dictKey, size, solverType):
+def solve(root, inputFile, outputFilesPath, dictKey, size, solverType, reduce=False):
+    inputPath = os.path.join(root, inputFile)
+    if reduce:
+        inputPath = reducedInput(inputPath)
     if solverType == 1:
-        cmd = "python3 Gurobi/MILP_Gurobi.py -f {}".format(os.path.join(root, inputFile))
+        cmd = "python3 Gurobi/MILP_Gurobi.py -f {} --cache".format(inputPath)
     elif solverType == 2:
-        cmd = "python3 LTIU/LTIU.py " + os.path.join(root, inputFile)
+        cmd = "python3 LTIU/LTIU.py " + inputPath
     elif solverType == 3:
-        cmd = "clingo Clingo/smti.lp Clingo/maxcardinality.lp input_ASP.lp --stats"
-        ASP_inputConverter(os.path.join(root, inputFile))
+        cmd = "clingo Clingo/smti.lp Clingo/maxcardinality.lp {} --stats".format(ASP_inputConverter(inputPath))
     elif solverType == 4:
-        cmd =  "python3 SAT-E/smti.py input_SAT.txt -opt=1 --outdir=OUTPUT"
-        SAT_inputConverter(os.path.join(root, inputFile), size)
+        cmd =  "python3 SAT-E/smti.py {} -opt=1 --outdir=OUTPUT --cache".format(SAT_inputConverter(inputPath, size))
     elif solverType == 5:
-        cmd =  "python3 OR-Tools/OR-Tools_CP_GP_opt.py --file " + os.path.join(root, inputFile) + " --opt=0"
+        cmd =  "python3 OR-Tools/OR-Tools_CP_GP_opt.py --file " + inputPath + " --opt=0"
     elif solverType == 6:
-        cmd =  "python3 OR-Tools/OR-Tools_CP.py --file " + os.path.join(root, inputFile)
+        cmd =  "python3 OR-Tools/OR-Tools_CP.py --file " + inputPath
     elif solverType == 7:
-        cmd =  "python3 OR-Tools/OR-Tools_MIP.py --file " + os.path.join(root, inputFile)
+        cmd =  "python3 OR-Tools/OR-Tools_MIP.py --file " + inputPath
     elif solverType == 8:
-        cmd = "python3 GA/matching_ga.py " + os.path.join(root, inputFile)
+        cmd = "python3 GA/matching_ga.py " + inputPath
 
     subPro = timeout(func=run_SMTI_Solver, command=cmd, timeoutValue=TIMEOUT_VALUE)
 
@@ -162,6 +127,7 @@ def main():
     # --solverType = -1 -> All of the solvers will run
 
     argparser.add_argument('--size', '-s', metavar='', help='Specify the size of the benchmark instances', type=int, default=-1, choices=[50,100])
+    argparser.add_argument('--reduce', help='Remove the pairs and agents that cannot be in any stable matching before solving', action='store_true')
     args = argparser.parse_args()
     selectedSolver = args.solverType
     size = args.size
@@ -186,9 +152,9 @@ def main():
             Dictionary_Key = instance_size + "_" + p1 + "_" + p2
             if selectedSolver == -1:
                 for i in range(1,len(solvers)+1):
-                    solve(root, inputFile, PATH_TO_OUTPUT_FILES, Dictionary_Key, int(instance_size), i)
+                    solve(root, inputFile, PATH_TO_OUTPUT_FILES, Dictionary_Key, int(instance_size), i, args.reduce)
             else:
-                solve(root, inputFile, PATH_TO_OUTPUT_FILES, Dictionary_Key, int(instance_size), selectedSolver)
+                solve(root, inputFile, PATH_TO_OUTPUT_FILES, Dictionary_Key, int(instance_size), selectedSolver, args.reduce)
 
 if __name__ == '__main__':
     main()
@@ -1,92 +1,51 @@
 import subprocess
 import os
-import re
+import sys
 import subprocessmethodrun
 import argparse
 
+from smti_instance import SMTIInstance, ASP_FORMAT_VERSION, SAT_E_FORMAT_VERSION, fresh_converted_path
+from instance_cache import default_cache
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'SAT-E'))
+import smti_batch
+
 
 TIMEOUT_VALUE = 2000 # in seconds
 OUTPUT_DIR = 'OUTPUT'
+CACHE = None # converted inputs and encodings, shared by all runs, opened by cache() on first use
+
+
+def cache():
+    global CACHE
+    if CACHE is None:
+        CACHE = default_cache()
+    return CACHE
 
 def SAT_inputConverter(inputFile, size):
-    output_str=''
-    with open(inputFile) as f:
-        lines = f.readlines()[3:]
-        for line in lines[:size]:
-           output_str += 'm ' + line.split()[0] + ' '
-           ff = re.findall('\(([\d ]+)\)', line)
-           prefs = []
-           for f in ff:
-               if ' ' in f:
-                   prefs.append('{' + f.replace(' ',',') + '}')
-               else:
-                   prefs.append(f)
-           output_str += ' '.join(prefs)
-           output_str += '\n'
-        for line in lines[size:]:
-           output_str += 'w ' + line.split()[0] + ' '
-           ff = re.findall('\(([\d ]+)\)', line)
-           prefs = []
-           for f in ff:
-               if ' ' in f:
-                   prefs.append('{' + f.replace(' ',',') + '}')
-               else:
-                   prefs.append(f)
-           output_str += ' '.join(prefs)
-           output_str += '\n'
-    
-    f = open('input_SAT.txt', 'w')
-    f.write(output_str)
-    f.close()
+    converted = fresh_converted_path(inputFile, 'sat')
+    if converted is not None:
+        return converted
+    return cache().get(inputFile, 'sat.txt', SAT_E_FORMAT_VERSION, lambda out: SMTIInstance.from_file(inputFile).write_sat_e(out))
 
 
 def ASP_inputConverter(inputFile):
-    # takes the inputFile(as path) and converts it into the input format for ASP solver.
-    # the converted input will be written in a file called input_ASP_Version.lp
-    # So, for each input file we will change this file only for ASP instead of creating new files for each input.
-
-    f = open(inputFile)
-    output_str = ''
-    lines = f.read().split('\n')
-    f.close()
-    m_size = int(lines[1])
-    w_size = int(lines[2])
-
-    output_str += 'man(1..{}).\n'.format(m_size)
-    output_str += 'woman(1..{}).\n'.format(w_size)
-
-    for line in lines[3:m_size + 3]:
-        m = line.split(' ')[0]
-        cnt = 1
-        for group in line.split(' (')[1:]:
-            gr = group.replace(')', '')
-            if gr != '':
-                for el in gr.split(' '):
-                    if el != '':
-                        output_str += 'mrank({},{},{}).\n'.format(m, el, cnt)
-                cnt += 1
-
-    for line in lines[m_size + 3:m_size + w_size + 3]:
-        w = line.split(' ')[0]
-        cnt = 1
-        for group in line.split(' (')[1:]:
-            gr = group.replace(')', '')
-            if gr != '':
-                for el in gr.split(' '):
-                    if el != '':
-                        output_str += 'wrank({},{},{}).\n'.format(w, el, cnt)
-                cnt += 1
-
-    f = open('input_ASP.lp', 'w')
-    f.write(output_str)
-    f.close()
+    # takes the inputFile(as path) and returns the path of its conversion into the input format for ASP solver.
+    # the converted input is kept in the instance cache (see instance_cache.py),
+    # so each input file is converted only once for all solvers and runs.
+    # instances generated with instance_generator.py -formats lp are used as they are,
+    # unless the instance is newer than its conversion (see fresh_converted_path).
+    converted = fresh_converted_path(inputFile, 'lp')
+    if converted is not None:
+        return converted
+    return cache().get(inputFile, 'lp', ASP_FORMAT_VERSION, lambda out: SMTIInstance.from_file(inputFile).write_asp(out))
 
 
 def run_cmodels(input_path):
     for f in os.listdir(input_path):
-        ASP_inputConverter(os.path.join(input_path, f))
+        asp_input = ASP_inputConverter(os.path.join(input_path, f))
         rsname = '{}/{}'.format(OUTPUT_DIR,f.replace('input', 'output').replace('.txt', '_SMTI_CMODELS.txt'))
-        command = "gringo Clingo/smti_lparse.lp input_ASP.lp | timeout -t 2000 -m 2000000 cmodels -zc -statistics"
+        command = "gringo Clingo/smti_lparse.lp {} | timeout -t 2000 -m 2000000 cmodels -zc -statistics".format(asp_input)
         retcode, stdout, stderr = subprocessmethodrun.run(command, shell=True, stdout=subprocess.PIPE)
         output = stdout.decode('utf-8')
         with open(rsname, "w") as out:
@@ -95,25 +54,29 @@ def run_cmodels(input_path):
 
 def run_clingo(input_path):
     for f in os.listdir(input_path):
-        ASP_inputConverter(os.path.join(input_path, f))
+        asp_input = ASP_inputConverter(os.path.join(input_path, f))
         rsname = '{}/{}'.format(OUTPUT_DIR,f.replace('input', 'output').replace('.txt','_SMTI_CLINGO.txt'))
-        command = "clingo --stats input_ASP.lp Clingo/smti.lp  --time-limit=2000"
+        command = "clingo --stats {} Clingo/smti.lp  --time-limit=2000".format(asp_input)
         retcode, stdout, stderr = subprocessmethodrun.run(command, shell=True, stdout=subprocess.PIPE)
         output = stdout.decode('utf-8')
         with open(rsname, "w") as out:
             print(rsname)
             out.write(output)
 
-def run_sat(input_path, size):
+def run_sat(input_path, size, workers=1):
+    # the instances are encoded and solved by SAT-E in this process (or in a
+    # pool of workers), only the SAT solver is started for each instance
+    if os.environ.get('SAT_SOLVER_PATH') is None:
+        raise Exception('SAT_SOLVER_PATH must contain the path to a SAT solver that accepts the DIMACS input format')
+    smti_batch.prepare_outdir('dum')
+    options = dict(solver=os.environ['SAT_SOLVER_PATH'], opt=0, output_dirname='dum', cache=cache())
+    jobs = []
     for f in os.listdir(input_path):
-        SAT_inputConverter(os.path.join(input_path, f), size)
+        sat_input = SAT_inputConverter(os.path.join(input_path, f), size)
         rsname = '{}/{}'.format(OUTPUT_DIR, f.replace('input', 'output').replace('.txt','_SMTI_SAT.txt'))
-        command = "python3 SAT-E/smti.py input_SAT.txt -opt=0 -outdir=dum"
-        retcode, stdout, stderr = subprocessmethodrun.run(command, shell=True, stdout=subprocess.PIPE)
-        output = stdout.decode('utf-8')
-        with open(rsname, "w") as out:
-            print(rsname)
-            out.write(output)
+        jobs.append((sat_input, rsname, options))
+    for sat_input, rsname, times in smti_batch.run_batch(jobs, workers):
+        print(rsname)
 
 
 def main():
@@ -121,6 +84,7 @@ def main():
 
     argparser.add_argument('--solverType', '-sT', metavar='', help='Specify the solver, 0: Clingo, 1: Cmodels 2:SAT', type=int, default=0, choices=[0, 1, 2])
     argparser.add_argument('--size', '-s', metavar='', help='Specify the size of the benchmark instances', type=int, default=50, choices=[50,100])
+    argparser.add_argument('--workers', '-w', metavar='', help='Number of instances solved in parallel by SAT', type=int, default=1)
     args = argparser.parse_args()
     size = args.size
 
@@ -131,7 +95,7 @@ def main():
     elif args.solverType == 1:
         run_cmodels(input_path)
     elif args.solverType == 2:
-        run_sat(input_path, size)
+        run_sat(input_path, size, args.workers)
 
 
 if __name__ == '__main__':
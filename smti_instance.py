@@ -0,0 +1,555 @@
+'''
+Shared array-backed representation of an SMTI instance.
+
+Every front-end (Gurobi, OR-Tools, LTIU, GA, SAT-E and the experiment runners)
+loads its input through this module, so an instance is parsed once into flat
+NumPy arrays instead of nested lists of strings.
+
+Agent ids are 1-based, as in the input files. The preference list of agent a is
+stored in CSR form: prefs[ptr[a-1]:ptr[a]]. Tie groups are delimited by
+gbound: the groups of agent a are g = gptr[a-1], ..., gptr[a]-1 and group g
+covers prefs[gbound[g]:gbound[g+1]]. Ranks are 1-based tie group indices and
+a rank of 0 means that the partner is unacceptable.
+Single ranks are looked up by binary search in a copy of the rows sorted by
+id, so that an instance takes memory in proportion to its lists; the dense
+rank matrices are only built on request (rank_matrix, SMTIInstance.dense_ranks),
+for small instances.
+
+The binary format (.smti) stores these arrays as little-endian int32 after a
+header of BINARY_HEADER_SIZE int32 values:
+    magic, version, n_men, n_women, len(men prefs), number of men's tie groups,
+    len(women prefs), number of women's tie groups
+followed, for men and then for women, by ptr, prefs, gptr and gbound.
+It is loaded with numpy.memmap, so no parsing takes place.
+'''
+import os
+
+import numpy as np
+
+BINARY_MAGIC = 0x49544d53  # b'SMTI'
+BINARY_VERSION = 1
+BINARY_HEADER_SIZE = 8
+# versions of the files produced by write_asp and write_sat_e, see instance_cache.py
+ASP_FORMAT_VERSION = 1
+SAT_E_FORMAT_VERSION = 1
+
+# formats written by SMTIInstance.write: (writer, extension, suffix of the directory
+# that holds the converted instances of a directory of text instances)
+FORMATS = {
+    'txt': ('write_text', '.txt', ''),
+    'lp': ('write_asp', '.lp', '-lp'),
+    'sat': ('write_sat_e', '.txt', '-sat'),
+    'smti': ('write_binary', '.smti', '-bin'),
+}
+
+
+class PreferenceTable:
+    '''
+    preference lists of one side of the market (men or women)
+    '''
+    def __init__(self, size, other_size, ptr, prefs, gptr, gbound):
+        self.size = size
+        self.other_size = other_size
+        self.ptr = np.asarray(ptr, dtype=np.int32)
+        self.prefs = np.asarray(prefs, dtype=np.int32)
+        self.gptr = np.asarray(gptr, dtype=np.int32)
+        self.gbound = np.asarray(gbound, dtype=np.int32)
+        self._entry_rank = None
+        self._rank_matrix = None
+        self._sorted = None
+
+    @classmethod
+    def from_groups(cls, groups, other_size):
+        ''' builds the table from a list (indexed by agent id - 1) of lists of tie groups '''
+        builder = TableBuilder(len(groups))
+        for agent, agent_groups in enumerate(groups, 1):
+            builder.add(agent, [x for group in agent_groups for x in group], [len(group) for group in agent_groups])
+        return builder.build(len(groups), other_size)
+
+    @property
+    def entry_rank(self):
+        ''' rank of every entry of prefs, aligned with prefs '''
+        if self._entry_rank is None:
+            group_sizes = np.diff(self.gbound)
+            agent_of_group = np.repeat(np.arange(self.size, dtype=np.int32), np.diff(self.gptr))
+            group_rank = np.arange(len(group_sizes), dtype=np.int32) - self.gptr[agent_of_group] + 1
+            self._entry_rank = np.repeat(group_rank, group_sizes).astype(np.int32)
+        return self._entry_rank
+
+    @property
+    def sorted_rows(self):
+        ''' (ids, ranks): the entries of every row sorted by id, with their ranks, aligned with prefs '''
+        if self._sorted is None:
+            owners = np.repeat(np.arange(self.size, dtype=np.int32), np.diff(self.ptr))
+            order = np.lexsort((self.prefs, owners))
+            self._sorted = (self.prefs[order], self.entry_rank[order])
+        return self._sorted
+
+    @property
+    def rank_matrix(self):
+        '''
+        dense (size+1) x (other_size+1) matrix of ranks, row and column 0 unused;
+        once built, rank uses it instead of the sorted rows
+        '''
+        if self._rank_matrix is None:
+            matrix = np.zeros((self.size + 1, self.other_size + 1), dtype=np.int32)
+            owners = np.repeat(np.arange(1, self.size + 1, dtype=np.int32), np.diff(self.ptr))
+            matrix[owners, self.prefs] = self.entry_rank
+            self._rank_matrix = matrix
+        return self._rank_matrix
+
+    def rank(self, agent, other):
+        if self._rank_matrix is not None:
+            return int(self._rank_matrix[agent, other])
+        ids, ranks = self.sorted_rows
+        lo, hi = int(self.ptr[agent - 1]), int(self.ptr[agent])
+        i = lo + int(np.searchsorted(ids[lo:hi], other))
+        return int(ranks[i]) if i < hi and ids[i] == other else 0
+
+    def acceptable(self, agent, other):
+        return self.rank(agent, other) != 0
+
+    def length(self, agent):
+        return int(self.ptr[agent] - self.ptr[agent - 1])
+
+    def num_groups(self, agent):
+        return int(self.gptr[agent] - self.gptr[agent - 1])
+
+    @property
+    def has_empty_groups(self):
+        ''' True if some tie group is empty, which only reduced instances have (see reduce_instance.py) '''
+        return bool((np.diff(self.gbound) == 0).any())
+
+    @property
+    def num_groups_max(self):
+        ''' length of the longest list of tie groups '''
+        return int(np.diff(self.gptr).max()) if self.size else 0
+
+    def pref_list(self, agent):
+        ''' flattened preference list of agent (ties broken in input order) '''
+        return self.prefs[self.ptr[agent - 1]:self.ptr[agent]]
+
+    def groups(self, agent):
+        ''' tie groups of agent as a list of arrays, most preferred first '''
+        bounds = self.gbound[self.gptr[agent - 1]:self.gptr[agent] + 1]
+        return [self.prefs[bounds[g]:bounds[g + 1]] for g in range(len(bounds) - 1)]
+
+    def group_lists(self):
+        ''' tie groups of every agent as nested python lists '''
+        return [[group.tolist() for group in self.groups(agent)] for agent in range(1, self.size + 1)]
+
+    def tuple_dict(self):
+        '''
+        preference lists in the form used by LTIU and GA:
+        {id: [partner or (tied partners), ...]}, with their rank table (see TupleDict)
+        '''
+        result = TupleDict()
+        for agent in range(1, self.size + 1):
+            result[agent] = [group[0] if len(group) == 1 else tuple(group)
+                             for group in (g.tolist() for g in self.groups(agent)) if group]
+        return result
+
+
+class SMTIInstance:
+    '''
+    an SMTI instance: the preference tables of men and women
+    '''
+    def __init__(self, men, women):
+        self.men = men
+        self.women = women
+        self.n_men = men.size
+        self.n_women = women.size
+        self._pairs = None
+
+    @classmethod
+    def from_groups(cls, men_groups, women_groups):
+        ''' men_groups[m-1] is the list of tie groups of man m, same for women '''
+        return cls(PreferenceTable.from_groups(men_groups, len(women_groups)),
+                   PreferenceTable.from_groups(women_groups, len(men_groups)))
+
+    @classmethod
+    def from_file(cls, filename):
+        ''' reads an instance in the text format (see README), the SAT-E format or the binary format '''
+        with open(filename, 'rb') as f:
+            if np.frombuffer(f.read(4).ljust(4, b'\0'), dtype='<i4')[0] == BINARY_MAGIC:
+                return read_binary(filename)
+        line = ''
+        with open(filename) as f:
+            for line in f:
+                if line.strip():
+                    break
+        if not line.strip():
+            raise ValueError('empty instance file: %s' % filename)
+        if line.lstrip().startswith(('m', 'w')):
+            return read_sat_e(filename)
+        return read_text(filename)
+
+    @property
+    def pairs(self):
+        ''' PairIndex of the mutually acceptable pairs '''
+        if self._pairs is None:
+            self._pairs = PairIndex(self)
+        return self._pairs
+
+    def dense_ranks(self):
+        ''' builds the dense rank matrices of both sides, for faster lookups on small instances '''
+        self.men.rank_matrix
+        self.women.rank_matrix
+        return self
+
+    def mrank(self, m, w):
+        ''' rank man m gives to woman w '''
+        return self.men.rank(m, w)
+
+    def wrank(self, w, m):
+        ''' rank woman w gives to man m '''
+        return self.women.rank(w, m)
+
+    def rank(self, m, w):
+        return self.mrank(m, w), self.wrank(w, m)
+
+    def acceptable(self, m, w):
+        ''' True if man m and woman w find each other acceptable '''
+        return self.men.acceptable(m, w) and self.women.acceptable(w, m)
+
+    def write_text(self, filename):
+        with open(filename, 'w') as f:
+            f.write('0\n{}\n{}\n'.format(self.n_men, self.n_women))
+            for table in (self.men, self.women):
+                if table.has_empty_groups:
+                    for agent in range(1, table.size + 1):
+                        f.write(str(agent) + ' ' + ''.join('(' + ' '.join(map(str, group)) + ') '
+                                                           for group in (g.tolist() for g in table.groups(agent))) + '\n')
+                    continue
+                # every entry is written as one of "id ", "(id ", "id) ", "(id) ", depending on
+                # whether it opens and/or closes a tie group; the strings are built once per id
+                ids = [str(x) for x in range(table.other_size + 1)]
+                lookup = np.array([x + ' ' for x in ids] + ['(' + x + ' ' for x in ids] +
+                                  [x + ') ' for x in ids] + ['(' + x + ') ' for x in ids], dtype=object)
+                kind = np.zeros(len(table.prefs), dtype=np.int64)
+                kind[table.gbound[:-1]] += 1
+                kind[table.gbound[1:] - 1] += 2
+                tokens = lookup[kind * (table.other_size + 1) + table.prefs]
+                ptr = table.ptr.tolist()
+                for agent in range(1, table.size + 1):
+                    f.write(str(agent) + ' ' + ''.join(tokens[ptr[agent - 1]:ptr[agent]]) + '\n')
+
+    def write_binary(self, filename):
+        header = [BINARY_MAGIC, BINARY_VERSION, self.n_men, self.n_women,
+                  len(self.men.prefs), len(self.men.gbound) - 1,
+                  len(self.women.prefs), len(self.women.gbound) - 1]
+        with open(filename, 'wb') as f:
+            np.asarray(header, dtype='<i4').tofile(f)
+            for table in (self.men, self.women):
+                for array in (table.ptr, table.prefs, table.gptr, table.gbound):
+                    array.astype('<i4', copy=False).tofile(f)
+
+    def write_asp(self, filename):
+        ''' writes the instance as man/1, woman/1, mrank/3 and wrank/3 facts '''
+        with open(filename, 'w') as f:
+            f.write('man(1..{}).\n'.format(self.n_men))
+            f.write('woman(1..{}).\n'.format(self.n_women))
+            for table, pred in ((self.men, 'mrank'), (self.women, 'wrank')):
+                owners = np.repeat(np.arange(1, table.size + 1), np.diff(table.ptr))
+                f.write(''.join('{}({},{},{}).\n'.format(pred, a, b, r) for a, b, r in
+                                zip(owners.tolist(), table.prefs.tolist(), table.entry_rank.tolist())))
+
+    def write_sat_e(self, filename):
+        ''' writes the instance in the input format of SAT-E/smti.py '''
+        with open(filename, 'w') as f:
+            for table, prefix in ((self.men, 'm'), (self.women, 'w')):
+                if table.has_empty_groups:
+                    for agent in range(1, table.size + 1):
+                        prefs = ['{' + ','.join(map(str, group)) + '}' if len(group) != 1 else str(group[0])
+                                 for group in (g.tolist() for g in table.groups(agent))]
+                        f.write('{} {} {}\n'.format(prefix, agent, ' '.join(prefs)))
+                    continue
+                # as in write_text, but tie groups are written as "{id,id}" and separated by spaces
+                ids = [str(x) for x in range(table.other_size + 1)]
+                lookup = np.array([x + ',' for x in ids] + ['{' + x + ',' for x in ids] +
+                                  [x + '} ' for x in ids] + [x + ' ' for x in ids], dtype=object)
+                kind = np.zeros(len(table.prefs), dtype=np.int64)
+                kind[table.gbound[:-1]] += 1
+                kind[table.gbound[1:] - 1] += 2
+                tokens = lookup[kind * (table.other_size + 1) + table.prefs]
+                ptr = table.ptr.tolist()
+                for agent in range(1, table.size + 1):
+                    f.write('{} {} {}\n'.format(prefix, agent, ''.join(tokens[ptr[agent - 1]:ptr[agent]])[:-1]))
+
+    def write(self, filename, fmt):
+        ''' writes the instance in one of FORMATS '''
+        getattr(self, FORMATS[fmt][0])(filename)
+
+
+class TupleDict(dict):
+    '''
+    preference lists {id: [partner or (tied partners), ...]} of LTIU and GA,
+    with a rank table built on first use: ranks[id][partner] is the index in
+    the list of id of the partner or of its tie group, ranks[id][-1] (no
+    partner) the length of the list, and partners that are not in the list
+    have no entry. ranks[id].get(partner, -1) is thus the index LTIU and GA
+    used to find by scanning the list. The lists must not be modified.
+    '''
+    @property
+    def ranks(self):
+        if '_ranks' not in self.__dict__:
+            self._ranks = {}
+            for agent, prefs in self.items():
+                ranks = {}
+                for index, entry in enumerate(prefs):
+                    for other in (entry if isinstance(entry, tuple) else (entry,)):
+                        ranks.setdefault(other, index)
+                ranks[-1] = len(prefs)
+                self._ranks[agent] = ranks
+        return self._ranks
+
+
+def tuple_ranks(prefs):
+    ''' rank table of preference lists of the form of TupleDict, built once for a TupleDict '''
+    if not isinstance(prefs, TupleDict):
+        prefs = TupleDict(prefs)
+    return prefs.ranks
+
+
+class PairIndex:
+    '''
+    the mutually acceptable pairs of an instance, so that models need variables
+    and constraints for these pairs only.
+
+    Pair p is (man[p], woman[p]) with ranks mrank[p] (given by the man) and
+    wrank[p] (given by the woman). Pairs are ordered by man and by his
+    preference: the pairs of man m are p = man_ptr[m-1], ..., man_ptr[m]-1 and
+    those he ranks at least as high as p end at man_better_end[p].
+    by_woman holds the pairs ordered by woman and by her preference: the pairs
+    of woman w are by_woman[woman_ptr[w-1]:woman_ptr[w]] and those she ranks at
+    least as high as p are by_woman[woman_ptr[w-1]:woman_better_end[p]].
+    '''
+    def __init__(self, instance):
+        men, women = instance.men, instance.women
+        stride = np.int64(instance.n_men + 1)
+        # rank given by the woman to every entry of the men's lists, by binary search
+        # over the keys (woman, man) of the women's lists
+        women_owner = np.repeat(np.arange(1, women.size + 1, dtype=np.int64), np.diff(women.ptr))
+        women_keys = women_owner * stride + women.prefs
+        order = np.argsort(women_keys, kind='stable')
+        women_keys = women_keys[order]
+        men_owner = np.repeat(np.arange(1, men.size + 1, dtype=np.int32), np.diff(men.ptr))
+        keys = men.prefs.astype(np.int64) * stride + men_owner
+        pos = np.minimum(np.searchsorted(women_keys, keys), max(len(women_keys) - 1, 0))
+        found = women_keys[pos] == keys if len(women_keys) else np.zeros(len(keys), dtype=bool)
+
+        self.man = men_owner[found]
+        self.woman = men.prefs[found]
+        self.mrank = men.entry_rank[found]
+        self.wrank = women.entry_rank[order[pos[found]]]
+        self.man_ptr = np.zeros(instance.n_men + 1, dtype=np.int32)
+        np.cumsum(np.bincount(self.man, minlength=instance.n_men + 1)[1:], out=self.man_ptr[1:])
+        self.by_woman = np.lexsort((self.wrank, self.woman)).astype(np.int32)
+        self.woman_ptr = np.zeros(instance.n_women + 1, dtype=np.int32)
+        np.cumsum(np.bincount(self.woman, minlength=instance.n_women + 1)[1:], out=self.woman_ptr[1:])
+
+        rank_stride = np.int64(max(men.num_groups_max, women.num_groups_max) + 2)
+        man_keys = self.man.astype(np.int64) * rank_stride + self.mrank
+        self.man_better_end = np.searchsorted(man_keys, man_keys, side='right').astype(np.int32)
+        woman_keys = self.woman[self.by_woman].astype(np.int64) * rank_stride + self.wrank[self.by_woman]
+        self.woman_better_end = np.empty(len(self.man), dtype=np.int32)
+        self.woman_better_end[self.by_woman] = np.searchsorted(woman_keys, woman_keys, side='right')
+
+    def __len__(self):
+        return len(self.man)
+
+    def of_man(self, m):
+        ''' pairs of man m, in his order of preference '''
+        return range(self.man_ptr[m - 1], self.man_ptr[m])
+
+    def of_woman(self, w):
+        ''' pairs of woman w, in her order of preference '''
+        return self.by_woman[self.woman_ptr[w - 1]:self.woman_ptr[w]]
+
+
+def converted_path(filename, fmt):
+    '''
+    path of the conversion into fmt of the text instance filename, in the
+    directory next to its own: dir/name.txt -> dir-lp/name.lp
+    '''
+    writer, ext, suffix = FORMATS[fmt]
+    directory, name = os.path.split(os.path.abspath(filename))
+    return os.path.join(directory + suffix, os.path.splitext(name)[0] + ext)
+
+
+def fresh_converted_path(filename, fmt):
+    '''
+    converted_path(filename, fmt) if that file exists and is at least as new
+    as filename, else None. A conversion older than its instance (the
+    instance was regenerated or edited since) is not used; the runners then
+    take the conversion from the instance cache, which is addressed by the
+    content of the instance and the version of the format.
+    '''
+    path = converted_path(filename, fmt)
+    try:
+        if os.stat(path).st_mtime_ns >= os.stat(filename).st_mtime_ns:
+            return path
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def parse_groups(text):
+    ''' "(2 3) (1)" -> [[2, 3], [1]], "()" is an empty tie group '''
+    return [[int(x) for x in chunk.split('(', 1)[1].split()] for chunk in text.split(')') if '(' in chunk]
+
+
+def _grow(array, needed):
+    ''' makes sure array holds at least needed elements, growing it in place by 1.5x steps '''
+    if len(array) < needed:
+        array.resize(max(needed, len(array) * 3 // 2 + 16), refcheck=False)
+    return array
+
+
+class TableBuilder:
+    '''
+    builds a PreferenceTable one agent at a time, writing every preference
+    list straight into int32 arrays so that no per-agent python objects are
+    kept while a file is read
+    '''
+    def __init__(self, size_hint=0, entries_hint=0):
+        self.agents = np.zeros(size_hint, dtype=np.int32)
+        self.ptr = np.zeros(size_hint + 1, dtype=np.int32)
+        self.gptr = np.zeros(size_hint + 1, dtype=np.int32)
+        self.prefs = np.zeros(entries_hint, dtype=np.int32)
+        self.gbound = np.zeros(entries_hint + 1, dtype=np.int32)
+        self.rows = 0
+        self.nnz = 0
+        self.ngroups = 0
+
+    def add(self, agent, ids, sizes):
+        ''' appends the list of agent: ids in preference order, sizes of its tie groups '''
+        _grow(self.agents, self.rows + 1)[self.rows] = agent
+        _grow(self.prefs, self.nnz + len(ids))[self.nnz:self.nnz + len(ids)] = ids
+        _grow(self.gbound, self.ngroups + len(sizes) + 1)
+        self.gbound[self.ngroups + 1:self.ngroups + len(sizes) + 1] = self.nnz + np.cumsum(sizes, dtype=np.int32)
+        self.rows += 1
+        self.nnz += len(ids)
+        self.ngroups += len(sizes)
+        _grow(self.ptr, self.rows + 1)[self.rows] = self.nnz
+        _grow(self.gptr, self.rows + 1)[self.rows] = self.ngroups
+
+    def build(self, size, other_size):
+        for array, length in ((self.agents, self.rows), (self.ptr, self.rows + 1), (self.gptr, self.rows + 1),
+                              (self.prefs, self.nnz), (self.gbound, self.ngroups + 1)):
+            array.resize(length, refcheck=False)
+        if self.rows == size and np.array_equal(self.agents, np.arange(1, size + 1)):
+            return PreferenceTable(size, other_size, self.ptr, self.prefs, self.gptr, self.gbound)
+        return self._reordered(size, other_size)
+
+    def _reordered(self, size, other_size):
+        ''' table for lines that were not given in id order or with missing agents '''
+        if len(np.unique(self.agents)) != self.rows:
+            raise Exception('duplicate agent in preference lists')
+        if self.rows and (self.agents.min() < 1 or self.agents.max() > size):
+            raise Exception('agent id out of range 1..%d' % size)
+        lens = np.zeros(size, dtype=np.int32)
+        glens = np.zeros(size, dtype=np.int32)
+        lens[self.agents - 1] = np.diff(self.ptr)
+        glens[self.agents - 1] = np.diff(self.gptr)
+        ptr = np.concatenate(([0], np.cumsum(lens))).astype(np.int32)
+        gptr = np.concatenate(([0], np.cumsum(glens))).astype(np.int32)
+        order = np.argsort(self.agents)
+        rows = order
+        # new position of every entry and group, row by row in id order
+        entry_src = np.repeat(self.ptr[rows] - ptr[self.agents[rows] - 1], np.diff(self.ptr)[rows])
+        prefs = self.prefs[np.arange(self.nnz) + entry_src]
+        group_src = np.repeat(self.gptr[rows] - gptr[self.agents[rows] - 1], np.diff(self.gptr)[rows])
+        old_groups = np.arange(self.ngroups) + group_src
+        # shift the end offset of every group from the old row start to the new one
+        row_of_group = np.repeat(rows, np.diff(self.gptr)[rows])
+        shift = ptr[self.agents[row_of_group] - 1] - self.ptr[row_of_group]
+        gbound = np.concatenate(([0], self.gbound[old_groups + 1] + shift)).astype(np.int32)
+        return PreferenceTable(size, other_size, ptr, prefs, gptr, gbound)
+
+
+def iter_text_agents(f, count):
+    '''
+    yields (agent id, ids, tie group sizes) for the next count agent lines
+    of a file in the text format, reading one line at a time
+    '''
+    read = 0
+    while read < count:
+        line = f.readline()
+        if not line:
+            break
+        agent, _, rest = line.strip().partition(' ')
+        if not agent:
+            continue
+        # "()" is an empty tie group, kept so that the ranks of the next groups do not change
+        groups = [chunk.split('(', 1)[1].split() for chunk in rest.split(')') if '(' in chunk]
+        yield int(agent), [int(x) for group in groups for x in group], [len(group) for group in groups]
+        read += 1
+
+
+def iter_sat_e_agents(f):
+    ''' yields (side, agent id, ids, tie group sizes) for every line in the SAT-E format '''
+    for line in f:
+        if line.startswith('#') or not line.strip():
+            continue
+        items = line.split()
+        if items[0] not in ('m', 'w'):
+            raise Exception('line not readable: %s' % line)
+        groups = [[x for x in item.strip('{}').split(',') if x] for item in items[2:]]
+        yield items[0], int(items[1]), [int(x) for group in groups for x in group], [len(group) for group in groups]
+
+
+def read_text(filename):
+    with open(filename) as f:
+        header = [f.readline().strip() for _ in range(3)]
+        if not all(header):
+            raise ValueError('missing number of men or women in the header of %s' % filename)
+        n_men = int(header[1])
+        n_women = int(header[2])
+        # every entry takes at least two characters (the id and a separator), so the entries of a side
+        # fit in half the file, and the arrays are allocated once instead of being regrown while reading
+        entries = min(n_men * n_women, os.fstat(f.fileno()).st_size // 2)
+        men = TableBuilder(n_men, entries)
+        women = TableBuilder(n_women, entries)
+        for agent, ids, sizes in iter_text_agents(f, n_men):
+            men.add(agent, ids, sizes)
+        for agent, ids, sizes in iter_text_agents(f, n_women):
+            women.add(agent, ids, sizes)
+    return SMTIInstance(men.build(n_men, n_women), women.build(n_women, n_men))
+
+
+def read_sat_e(filename):
+    ''' reads the "m 1 2 {3,4}" format used by SAT-E '''
+    builders = {'m': TableBuilder(), 'w': TableBuilder()}
+    with open(filename) as f:
+        for side, agent, ids, sizes in iter_sat_e_agents(f):
+            builders[side].add(agent, ids, sizes)
+    n_men = int(builders['m'].agents[:builders['m'].rows].max(initial=0))
+    n_women = int(builders['w'].agents[:builders['w'].rows].max(initial=0))
+    return SMTIInstance(builders['m'].build(n_men, n_women), builders['w'].build(n_women, n_men))
+
+
+def read_binary(filename, mmap=True):
+    ''' loads a .smti file; with mmap the arrays are read-only views of the file '''
+    if mmap:
+        data = np.memmap(filename, dtype='<i4', mode='r')
+    else:
+        data = np.fromfile(filename, dtype='<i4')
+    if len(data) < BINARY_HEADER_SIZE or data[0] != BINARY_MAGIC:
+        raise Exception('not an SMTI binary file: %s' % filename)
+    if data[1] != BINARY_VERSION:
+        raise Exception('unsupported SMTI binary version %d: %s' % (data[1], filename))
+    n_men, n_women, men_nnz, men_groups, women_nnz, women_groups = data[2:BINARY_HEADER_SIZE].tolist()
+    offset = BINARY_HEADER_SIZE
+
+    def take(length):
+        nonlocal offset
+        array = data[offset:offset + length]
+        offset += length
+        return array
+
+    men = PreferenceTable(n_men, n_women, take(n_men + 1), take(men_nnz), take(n_men + 1), take(men_groups + 1))
+    women = PreferenceTable(n_women, n_men, take(n_women + 1), take(women_nnz), take(n_women + 1), take(women_groups + 1))
+    if offset != len(data):
+        raise Exception('truncated or corrupt SMTI binary file: %s' % filename)
+    return SMTIInstance(men, women)
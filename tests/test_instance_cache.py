@@ -0,0 +1,49 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import instance_cache
+from instance_cache import InstanceCache
+
+
+def make_instances(tmp_path, count):
+    files = []
+    for i in range(count):
+        f = tmp_path / 'input-{}.txt'.format(i)
+        f.write_text('0\n{}\n1\n'.format(i))
+        files.append(str(f))
+    return files
+
+
+def test_evicts_least_recently_used_without_walking(tmp_path, monkeypatch):
+    cache = InstanceCache(str(tmp_path / 'cache'), max_bytes=3 * 100)
+    files = make_instances(tmp_path, 5)
+    walks = []
+    real_walk = os.walk
+    monkeypatch.setattr(instance_cache.os, 'walk', lambda *a: walks.append(a) or real_walk(*a))
+    paths = [cache.get(f, 'lp', 1, lambda out: open(out, 'w').write('x' * 100)) for f in files[:3]]
+    assert cache.find(files[0], 'lp', 1) == paths[0]  # files[1] is now the least recently used
+    cache.get(files[3], 'lp', 1, lambda out: open(out, 'w').write('x' * 100))
+    assert [os.path.exists(p) for p in paths] == [True, False, True]
+    assert len(walks) == 1
+
+    # a cache opened later lists what is on disk
+    reopened = InstanceCache(str(tmp_path / 'cache'), max_bytes=3 * 100)
+    assert len(reopened.entries()) == 3 and reopened._total == 300
+    assert reopened.find(files[1], 'lp', 1) is None
+
+
+def test_entries_being_built_are_not_indexed_or_evicted(tmp_path):
+    cache = InstanceCache(str(tmp_path / 'cache'), max_bytes=100)
+    files = make_instances(tmp_path, 2)
+    # another process is building the entry of files[0]
+    root, ext = os.path.splitext(cache.path(files[0], 'lp', 1))
+    building = '{}{}{}{}'.format(root, instance_cache.TMP_MARKER, 12345, ext)
+    os.makedirs(os.path.dirname(building))
+    with open(building, 'w') as f:
+        f.write('x' * 1000)
+    assert building not in cache.entries() and cache._total == 0
+
+    cache.get(files[1], 'lp', 1, lambda out: open(out, 'w').write('x' * 100))
+    assert os.path.exists(building)
+    os.replace(building, cache.path(files[0], 'lp', 1))
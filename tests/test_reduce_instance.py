@@ -0,0 +1,71 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from instance_generator import GentProsserInstance
+from reduce_instance import reduce_instance
+
+
+def groups_of(instance):
+    return instance.men.group_lists(), instance.women.group_lists()
+
+
+def reducible_pairs(instance):
+    ''' the pairs one of the two rules of reduce_instance still removes '''
+    lists = groups_of(instance)
+    mutual = {(m, w) for m, groups in enumerate(lists[0], 1) for group in groups for w in group} & \
+             {(m, w) for w, groups in enumerate(lists[1], 1) for group in groups for m in group}
+    pairs = set()
+    for side in (0, 1):
+        for agent, groups in enumerate(lists[side], 1):
+            for group in groups:
+                for other in group:
+                    if ((agent, other) if side == 0 else (other, agent)) not in mutual:
+                        pairs.add((side, agent, other))
+            top = [group for group in groups if group]
+            if not top or len(top[0]) != 1:
+                continue
+            partner = top[0][0]
+            partner_groups = [group for group in lists[1 - side][partner - 1] if group]
+            if agent in partner_groups[0]:
+                pairs.update((1 - side, partner, other) for group in partner_groups[1:] for other in group)
+    return pairs
+
+
+def stable_matchings(instance):
+    ''' all weakly stable matchings, by brute force '''
+    men, women = groups_of(instance)
+    mrank = {(m, w): r for m, groups in enumerate(men, 1) for r, group in enumerate(groups) for w in group}
+    wrank = {(m, w): r for w, groups in enumerate(women, 1) for r, group in enumerate(groups) for m in group}
+    pairs = sorted(set(mrank) & set(wrank))
+    result = set()
+
+    def extend(m, matching, used):
+        if m > instance.n_men:
+            partner_m, partner_w = dict(matching), {w: m for m, w in matching}
+            for (a, b) in pairs:
+                if ((a not in partner_m or mrank[a, b] < mrank[a, partner_m[a]]) and
+                        (b not in partner_w or wrank[a, b] < wrank[partner_w[b], b])):
+                    return
+            result.add(frozenset(matching))
+            return
+        extend(m + 1, matching, used)
+        for (a, b) in pairs:
+            if a == m and b not in used:
+                extend(m + 1, matching + [(a, b)], used | {b})
+
+    extend(1, [], set())
+    return result
+
+
+def test_reduction_reaches_fixpoint_and_keeps_stable_matchings():
+    rng = np.random.default_rng(0)
+    for _ in range(600):
+        n = int(rng.integers(2, 6))
+        instance = GentProsserInstance(n, n, float(rng.choice([0.1, 0.3, 0.5])), float(rng.choice([0.2, 0.5, 0.8])), rng)
+        reduced = reduce_instance(instance).instance
+        assert not reducible_pairs(reduced)
+        if n <= 4:
+            assert stable_matchings(reduced) == stable_matchings(instance)
@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'SAT-E'))
+pytest.importorskip('pysat')
+import smti
+
+
+def test_stratified_egalitarian_without_soft_clauses(tmp_path):
+    # every list is a single tie group, so egal=ranks has no soft clauses
+    filename = tmp_path / 'input.txt'
+    filename.write_text('0\n2\n2\n1 (1 2)\n2 (1 2)\n1 (1 2)\n2 (2 1)\n')
+    problem = smti.ProblemInstance.from_file(str(filename))
+    constraints, res_match, variable_registry = problem.encode(2, egal='ranks')
+    assert len(constraints.soft_weights) == 0
+    for stratify in (False, True):
+        model = constraints.solve(2, stratify=stratify)
+        assert model is not None
+        matching = problem.decode_matching(model, variable_registry)
+        assert sorted(matching) == [1, 2] and smti.NIL_WOMAN_UID not in matching.values()
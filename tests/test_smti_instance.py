@@ -0,0 +1,67 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from smti_instance import SMTIInstance, converted_path, fresh_converted_path
+import instance_generator
+import smti_instance
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+INSTANCE = os.path.join(HERE, os.pardir, 'benchmark-instances-50', 'input-smti-s-50--i-0.5pc-t-0.5pc--1.txt')
+
+
+def test_ranks_from_sorted_rows_match_dense_matrix():
+    instance = SMTIInstance.from_file(INSTANCE)
+    sparse = [[(instance.mrank(m, w), instance.wrank(w, m), instance.acceptable(m, w))
+               for w in range(1, instance.n_women + 1)] for m in range(1, instance.n_men + 1)]
+    assert instance.men._rank_matrix is None and instance.women._rank_matrix is None
+    instance.dense_ranks()
+    dense = [[(instance.mrank(m, w), instance.wrank(w, m), instance.acceptable(m, w))
+              for w in range(1, instance.n_women + 1)] for m in range(1, instance.n_men + 1)]
+    assert sparse == dense
+    for m in range(1, instance.n_men + 1):
+        for rank, group in enumerate(instance.men.groups(m), 1):
+            assert all(instance.mrank(m, w) == rank for w in group.tolist())
+
+
+def test_ranks_of_unsorted_lists():
+    instance = SMTIInstance.from_groups([[[3], [1, 2]], []], [[[1]], [[2, 1]], [[1]]])
+    assert [instance.mrank(1, w) for w in (1, 2, 3)] == [2, 2, 1]
+    assert [instance.mrank(2, w) for w in (1, 2, 3)] == [0, 0, 0]
+    assert instance.acceptable(1, 3) and not instance.acceptable(2, 2)
+    assert np.array_equal(instance.men.rank_matrix[1], [0, 2, 2, 1])
+
+
+@pytest.mark.parametrize('content', ['', '\n\n', '0\n', '0\n2\n'])
+def test_empty_or_header_only_file(tmp_path, content):
+    filename = tmp_path / 'input.txt'
+    filename.write_text(content)
+    with pytest.raises(ValueError):
+        SMTIInstance.from_file(str(filename))
+
+
+def test_conversions_older_than_the_instance_are_not_used(tmp_path):
+    instance = SMTIInstance.from_file(INSTANCE)
+    fname = str(tmp_path / 'inst' / 'input-1.txt')
+    os.makedirs(os.path.dirname(fname))
+    instance_generator.WriteInstance(instance, fname, ('lp', 'txt'))
+    assert fresh_converted_path(fname, 'lp') == converted_path(fname, 'lp')
+    assert fresh_converted_path(fname, 'sat') is None
+
+    # the instance is regenerated without its conversions
+    st = os.stat(fname)
+    os.utime(fname, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert fresh_converted_path(fname, 'lp') is None
+
+
+def test_text_instances_are_read_without_regrowing_the_arrays(monkeypatch):
+    grown = []
+    real_grow = smti_instance._grow
+    monkeypatch.setattr(smti_instance, '_grow',
+                        lambda array, needed: (len(array) < needed and grown.append(needed)) or real_grow(array, needed))
+    instance = SMTIInstance.from_file(INSTANCE)
+    assert grown == []
+    assert instance.men.ptr[-1] == len(instance.men.prefs) and instance.women.ptr[-1] == len(instance.women.prefs)